@@ -0,0 +1,133 @@
+''' Fetches saved by utils.canonical on the outlinks of a recorded crawl:
+every link of every page, as written in the page and made absolute but not
+canonicalized, deduplicated the old way (utils.normalize + get_urlhash) and
+by canonical url. The pages come from a crawl's PAGESTORE or a recorded
+site. Without either, synthetic outlinks with the usual aliases (scheme,
+www, default port, index.html, tracking parameters, query order, dot
+segments, wiki views) are used.
+
+The urls in a save file are already canonical, so they cannot be used.
+
+    python -m benchmarks.bench_canonical --pages pages
+    python -m benchmarks.bench_canonical --corpus DIR_OF_A_RECORDED_SITE
+    python -m benchmarks.bench_canonical --links 100000
+'''
+import time
+import random
+
+from argparse import ArgumentParser
+from urllib.parse import urljoin
+
+from benchmarks.corpus import RecordedSite
+from utils import get_urlhash, normalize
+from utils.canonical import canonicalize
+from utils.page_store import PageStore, stored_response
+from utils.parse import parse_page
+from utils.response import Response
+import scraper
+
+
+def upper_host(url):
+    scheme, _, rest = url.partition("://")
+    host, _, path = rest.partition("/")
+    return f"{scheme}://{host.upper()}/{path}"
+
+
+ALIASES = [
+    lambda url: url.replace("https://", "http://"),
+    lambda url: url.replace(".ics.uci.edu/", ".ics.uci.edu:443/"),
+    upper_host,
+    lambda url: url + "/index.html",
+    lambda url: url + "/",
+    lambda url: url + "?utm_source=newsletter&utm_medium=email",
+    lambda url: url.replace("/page/", "/page/./"),
+    lambda url: url.replace("/page/", "/news/../page/"),
+    lambda url: url + "#section-2"
+]
+
+
+def synthetic_links(count, hosts=50, pages=200, seed=0):
+    rng = random.Random(seed)
+    links = list()
+    while len(links) < count:
+        h, i = rng.randrange(hosts), rng.randrange(pages)
+        if rng.random() < 0.1:
+            page = f"https://wiki.ics.uci.edu/doku.php?id=h{h}p{i}"
+            links.append(page + rng.choice(
+                ["", "&do=diff", "&rev=1690000000", "&do=edit", "&tab_files=files"]))
+            continue
+        url = f"https://host{h}.ics.uci.edu/page/{i}"
+        if rng.random() < 0.3:
+            url = rng.choice(ALIASES)(url)
+        if rng.random() < 0.1:
+            base, hash_, fragment = url.partition("#")
+            query = rng.choice(["a=1&b=2", "b=2&a=1"])
+            url = f"{base}{'&' if '?' in base else '?'}{query}{hash_}{fragment}"
+        links.append(url)
+    return links
+
+
+def outlinks(responses):
+    ''' The links of every page that scraper.analyze_page would parse, made
+    absolute as it does, before canonicalize. '''
+    links = list()
+    for url, resp in responses:
+        content = scraper.page_content(resp)
+        if content is None:
+            continue
+        links.extend(urljoin(url, href) for href in parse_page(content).hrefs)
+    return links
+
+
+def stored_pages(path):
+    store = PageStore(path)
+    try:
+        for page in store.pages():
+            yield page[0], stored_response(page)
+    finally:
+        store.close()
+
+
+def recorded_pages(path):
+    site = RecordedSite(path)
+    for url in site.index:
+        status, body, content_type = site(url)
+        yield url, Response.from_page(url, status, body, content_type)
+
+
+def main(pages, corpus, count):
+    if pages:
+        urls = outlinks(stored_pages(pages))
+    elif corpus:
+        urls = outlinks(recorded_pages(corpus))
+    else:
+        urls = synthetic_links(count)
+    old = {get_urlhash(normalize(url)) for url in urls}
+    start = time.perf_counter()
+    canonical = [canonicalize(url) for url in urls]
+    elapsed = time.perf_counter() - start
+    new = {get_urlhash(url) for url in canonical}
+    groups = dict()
+    for url, canonical_url in zip(urls, canonical):
+        groups.setdefault(canonical_url, set()).add(url)
+    print(f"{len(urls)} urls")
+    print(f"{len(old):>10} fetches, normalize")
+    print(f"{len(new):>10} fetches, canonicalize")
+    print(f"{len(old) - len(new):>10} fetches saved "
+          f"({(len(old) - len(new)) / max(len(old), 1) * 100:.1f}%)")
+    print(f"canonicalize: {elapsed / max(len(urls), 1) * 1e6:.1f}us/url")
+    print("most aliased:")
+    for canonical_url, aliases in sorted(
+            groups.items(), key=lambda x: -len(x[1]))[:3]:
+        print(f"  {canonical_url}")
+        for alias in sorted(aliases)[:6]:
+            print(f"    {alias}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=str, default=None)
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--links", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.pages, args.corpus, args.links)
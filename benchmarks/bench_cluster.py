@@ -0,0 +1,115 @@
+''' A partitioned crawl of a synthetic site by 1, 2, 4 ... local crawler
+nodes (launch.py processes sharing a local dataframe server, see
+crawler/cluster.py): wall time, pages/sec, pages fetched twice across nodes
+and whether node 0's merged report matches the single node crawl. The
+nodes are started one after another, each once the previous one has
+registered.
+
+    python -m benchmarks.bench_cluster --hosts 40 --pages 30 --nodes 1 2 4
+'''
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+from argparse import ArgumentParser
+from collections import Counter
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.corpus import TrapSite
+from benchmarks.harness import ROOT, write_config
+from benchmarks.registration_server import RegistrationServer
+from crawler.cluster import DataframeServer
+from crawler.store import FrontierStore
+
+
+def wait_registered(node_dir, process, timeout=30):
+    ''' Wait until a node got its cache server: two nodes registering at
+    once with the same user agent conflict on its Register object. The node
+    opens its CLUSTER log right after registering. '''
+    deadline = time.monotonic() + timeout
+    log = os.path.join(node_dir, "Logs", "CLUSTER.log")
+    while not os.path.exists(log) and process.poll() is None:
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"{node_dir} did not register in {timeout}s")
+        time.sleep(0.05)
+
+
+def crawl(site, registration, nodes, threads, politeness):
+    ''' Seconds to crawl site with `nodes` nodes, the urls every node
+    fetched and node 0's report. '''
+    dataframe = DataframeServer().start()
+    with tempfile.TemporaryDirectory() as cwd:
+        processes = list()
+        start = time.perf_counter()
+        for index in range(nodes):
+            node_dir = os.path.join(cwd, f"node-{index}")
+            os.makedirs(node_dir)
+            write_config(
+                os.path.join(ROOT, "config.ini"),
+                [f"CRAWLER.POLITENESS={politeness}", f"THREADCOUNT={threads}",
+                 "PAGESTORE=", "STATS=false", f"NODES={nodes}",
+                 f"NODEINDEX={index}", f"DFHOST={dataframe.address[0]}",
+                 f"DFPORT={dataframe.address[1]}"],
+                registration.address, site.seed_urls(),
+                os.path.join(node_dir, "config.ini"))
+            processes.append(subprocess.Popen(
+                [sys.executable, os.path.join(ROOT, "launch.py"), "--restart"],
+                cwd=node_dir, env=dict(os.environ, PYTHONPATH=ROOT),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            if nodes > 1:
+                wait_registered(node_dir, processes[-1])
+        for process in processes:
+            if process.wait():
+                raise RuntimeError(f"A crawler node exited with {process.returncode}")
+        elapsed = time.perf_counter() - start
+        fetched = list()
+        for index in range(nodes):
+            store = FrontierStore(os.path.join(cwd, f"node-{index}", "frontier.db"))
+            fetched.append([url for url, completed in store.values() if completed])
+            store.close()
+        with open(os.path.join(cwd, "node-0", "report.txt")) as report:
+            report = report.read()
+    dataframe.stop()
+    return elapsed, fetched, report
+
+
+def main(hosts, pages, latency, politeness, threads, node_counts):
+    site = TrapSite(hosts, pages)
+    cache = CacheServer(site, latency=latency).start()
+    registration = RegistrationServer(cache.address).start()
+    print(f"{hosts} hosts x {pages} pages, {threads} threads per node, "
+          f"{politeness}s politeness, {latency * 1000:.0f}ms latency")
+    single = None
+    try:
+        for nodes in node_counts:
+            elapsed, fetched, report = crawl(
+                site, registration, nodes, threads, politeness)
+            total = sum(len(urls) for urls in fetched)
+            twice = sum(
+                count - 1 for count in Counter(
+                    url for urls in fetched for url in urls).values()
+                if count > 1)
+            if single is None:
+                single = report
+            print(f"{nodes} nodes: {total} pages in {elapsed:.1f}s "
+                  f"({total / elapsed:.1f} pages/s), per node "
+                  f"{[len(urls) for urls in fetched]}, {twice} fetched twice, "
+                  f"report {'identical' if report == single else 'DIFFERENT'}")
+    finally:
+        registration.stop()
+        cache.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=40)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--politeness", type=float, default=0.05)
+    parser.add_argument("--threads", type=int, default=2)
+    parser.add_argument("--nodes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+    main(args.hosts, args.pages, args.latency, args.politeness, args.threads,
+         args.nodes)
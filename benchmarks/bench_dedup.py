@@ -0,0 +1,78 @@
+''' Lookups per second and peak RSS of NearDuplicateIndex at 100k and 1M
+fingerprints (each size runs in its own process so RSS is not shared),
+and fingerprinting speed on a large page.
+
+    python -m benchmarks.bench_dedup [--sizes 100000 1000000]
+'''
+import os
+import sys
+import time
+import random
+import resource
+import tempfile
+import subprocess
+
+from argparse import ArgumentParser
+
+from utils.dedup import fingerprint, NearDuplicateIndex
+
+
+def peak_rss_mb():
+    # kilobytes on linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_size(size, lookups):
+    rng = random.Random(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "simhash_index")
+        index = NearDuplicateIndex(path)
+        fps = [rng.getrandbits(64) for _ in range(size)]
+        start = time.perf_counter()
+        for i in range(0, size, 10000):
+            index.add_many(fps[i:i + 10000])
+        index.checkpoint()
+        build = time.perf_counter() - start
+        del fps
+        queries = [rng.getrandbits(64) for _ in range(lookups)]
+        start = time.perf_counter()
+        for query in queries:
+            index.find(query)
+        lookup = lookups / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for query in queries[:lookups // 10]:
+            index.check_and_add(query)
+        insert = (lookups // 10) / (time.perf_counter() - start)
+        index.close()
+        start = time.perf_counter()
+        reloaded = NearDuplicateIndex(path)
+        reloaded.find(0)
+        load = time.perf_counter() - start
+    print(f"{size:>9} {build:>8.2f}s {lookup:>12,.0f} {insert:>12,.0f} "
+          f"{load:>8.3f}s {peak_rss_mb():>8.1f}")
+
+
+def main(sizes, lookups):
+    print(f"{'size':>9} {'build':>9} {'lookups/s':>12} {'check+add/s':>12} "
+          f"{'reload':>9} {'RSS MB':>8}")
+    for size in sizes:
+        subprocess.run([
+            sys.executable, "-m", "benchmarks.bench_dedup",
+            "--one", str(size), "--lookups", str(lookups)], check=True)
+    text = "research computer science student projects data " * 80000
+    start = time.perf_counter()
+    fingerprint(text)
+    print(f"fingerprint of a {len(text) / 2**20:.1f} MB page: "
+          f"{time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--one", type=int, default=None)
+    args = parser.parse_args()
+    if args.one:
+        run_size(args.one, args.lookups)
+    else:
+        main(args.sizes, args.lookups)
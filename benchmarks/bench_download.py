@@ -0,0 +1,79 @@
+''' Downloads per second from a local stand-in cache server: the pooled
+keep-alive DownloadClient against a fresh requests.get per url.
+
+    python -m benchmarks.bench_download --urls 2000 --threads 1 4
+'''
+import time
+import types
+import logging
+
+from argparse import ArgumentParser
+from threading import Thread
+
+import requests
+import cbor
+
+from benchmarks.cache_server import CacheServer
+from utils.download import download
+from utils.response import Response
+
+
+def site(url):
+    return 200, b"<html><body>" + url.encode() + b"</body></html>", "text/html"
+
+
+def old_download(url, config, logger=None):
+    host, port = config.cache_server
+    resp = requests.get(
+        f"http://{host}:{port}/",
+        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    return Response(cbor.loads(resp.content))
+
+
+def run(fetch, config, urls, threads):
+    logger = logging.getLogger("bench")
+    logger.setLevel(logging.CRITICAL)
+    per_thread = urls // threads
+    failed = list()
+
+    def work(tid):
+        for i in range(per_thread):
+            resp = fetch(f"https://www.ics.uci.edu/{tid}/{i}", config, logger)
+            if resp.status != 200:
+                failed.append(resp.url)
+
+    workers = [Thread(target=work, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    if failed:
+        print(f"{len(failed)} downloads failed after all retries")
+    return per_thread * threads / elapsed
+
+
+def main(urls, threads, error_rate):
+    server = CacheServer(site, error_rate=error_rate).start()
+    config = types.SimpleNamespace(
+        cache_server=server.address, user_agent="IR benchmark",
+        download_timeout=5.0, download_retries=3, download_backoff=0.01,
+        max_page_size=0, parse_size=0, page_store="")
+    print(f"{'threads':>8} {'pooled/s':>10} {'requests.get/s':>15}")
+    for count in threads:
+        pooled = run(download, config, urls, count)
+        fresh = run(old_download, config, urls, count) if not error_rate else 0.0
+        print(f"{count:>8} {pooled:>10.0f} {fresh:>15.0f}")
+    from utils.download import get_client
+    print(get_client(config).stats())
+    server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    main(args.urls, args.threads, args.error_rate)
@@ -0,0 +1,96 @@
+''' Pages per second of a whole crawl of a synthetic multi-host site served
+by a local stand-in cache server: the threaded Worker engine against the
+asyncio engine.
+
+    python -m benchmarks.bench_engines --hosts 50 --pages 40 --latency 0.02
+
+Every engine crawls in a subprocess with its own temporary working
+directory, since the frontier, report and fingerprint files are relative to
+it.
+'''
+import os
+import sys
+import json
+import time
+import tempfile
+import subprocess
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.corpus import SyntheticSite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def crawl(address, seeds, engine, threads, fetches, processes, delay):
+    ''' Runs in the subprocess: crawl everything and print the timings. '''
+    from utils.config import Config
+    from crawler import Crawler
+    import scraper
+
+    cparser = ConfigParser()
+    cparser.read_dict({
+        "IDENTIFICATION": {"USERAGENT": "IR benchmark"},
+        "CONNECTION": {"HOST": address[0], "PORT": str(address[1])},
+        "CRAWLER": {"SEEDURL": ",".join(seeds), "POLITENESS": str(delay)},
+        "LOCAL PROPERTIES": {
+            "SAVE": "frontier.db", "THREADCOUNT": str(threads),
+            "ENGINE": engine, "ASYNCFETCHES": str(fetches),
+            "PARSEPROCESSES": str(processes)}})
+    config = Config(cparser)
+    config.cache_server = tuple(address)
+    start = time.perf_counter()
+    crawler = Crawler(config, True)
+    crawler.start()
+    elapsed = time.perf_counter() - start
+    # pages still in the workers' report shards, as in launch.main
+    scraper.report_stats.flush()
+    return {"pages": len(scraper.report_stats.unique_links), "seconds": elapsed}
+
+
+def run(server, site, engine, args):
+    command = [
+        sys.executable, "-m", "benchmarks.bench_engines", "--child", json.dumps({
+            "address": list(server.address), "seeds": site.seed_urls(),
+            "engine": engine, "threads": args.threads, "fetches": args.fetches,
+            "processes": args.processes, "delay": args.delay})]
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    with tempfile.TemporaryDirectory() as cwd:
+        result = subprocess.run(
+            command, cwd=cwd, env=env, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, check=True)
+    return json.loads(result.stdout.decode().strip().splitlines()[-1])
+
+
+def main(args):
+    site = SyntheticSite(args.hosts, args.pages, seed=args.seed)
+    server = CacheServer(site, latency=args.latency).start()
+    print(f"{len(site)} pages on {args.hosts} hosts, {args.latency * 1000:.0f}ms "
+          f"cache latency, {args.delay * 1000:.0f}ms politeness per host")
+    print(f"{'engine':>8} {'pages':>8} {'seconds':>8} {'pages/s':>8}")
+    for engine in args.engines:
+        result = run(server, site, engine, args)
+        print(f"{engine:>8} {result['pages']:>8} {result['seconds']:>8.2f} "
+              f"{result['pages'] / result['seconds']:>8.1f}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=50)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--fetches", type=int, default=200)
+    parser.add_argument("--processes", type=int, default=0)
+    parser.add_argument("--engines", nargs="+", default=["threads", "async"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--child", type=str, default=None)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(crawl(**json.loads(args.child))))
+    else:
+        main(args)
@@ -0,0 +1,70 @@
+''' Urls added per second to the frontier save file from 1, 4 and 16
+threads: FrontierStore (SQLite WAL, batched commits) against the old shelve
+with a sync() after every write, serialized with a lock.
+
+    python -m benchmarks.bench_frontier_store --urls 20000
+'''
+import os
+import time
+import shelve
+import tempfile
+
+from argparse import ArgumentParser
+from threading import Thread, RLock
+
+from crawler.store import FrontierStore
+from utils import get_urlhash
+
+
+class ShelveStore(object):
+    def __init__(self, path):
+        self.save = shelve.open(path)
+        self.lock = RLock()
+
+    def add(self, urlhash, url):
+        with self.lock:
+            if urlhash in self.save:
+                return False
+            self.save[urlhash] = (url, False)
+            self.save.sync()
+            return True
+
+    def close(self):
+        self.save.close()
+
+
+def run(store, threads, urls):
+    per_thread = urls // threads
+
+    def work(tid):
+        for i in range(per_thread):
+            url = f"https://www.ics.uci.edu/t{tid}/page/{i}"
+            store.add(get_urlhash(url), url)
+
+    workers = [Thread(target=work, args=(t,)) for t in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    store.close()
+    return per_thread * threads / (time.perf_counter() - start)
+
+
+def main(urls, shelve_urls):
+    print(f"{'threads':>8} {'FrontierStore':>14} {'shelve+sync':>12}  (urls/sec)")
+    for threads in (1, 4, 16):
+        with tempfile.TemporaryDirectory() as tmp:
+            new = run(FrontierStore(os.path.join(tmp, "frontier.db")),
+                      threads, urls)
+            old = run(ShelveStore(os.path.join(tmp, "frontier.shelve")),
+                      threads, shelve_urls)
+        print(f"{threads:>8} {new:>14.0f} {old:>12.0f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=20000)
+    parser.add_argument("--shelve-urls", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.urls, args.shelve_urls)
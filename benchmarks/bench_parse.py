@@ -0,0 +1,57 @@
+''' Parse throughput of utils.parse.parse_page against the old
+BeautifulSoup tree + three get_text() calls + find_all('a'), and a check
+that both give the same text and hrefs.
+
+    python -m benchmarks.bench_parse [--corpus DIR_OF_SAVED_PAGES]
+'''
+import re
+import time
+
+from argparse import ArgumentParser
+
+from bs4 import BeautifulSoup
+
+from benchmarks.corpus import load_corpus
+from utils.parse import parse_page
+
+
+def soup_extract(content):
+    soup = BeautifulSoup(content, 'lxml')
+    len(soup.get_text())
+    soup.get_text()
+    words = [word.lower() for word in re.findall(
+        r"[a-zA-Z][a-zA-Z0-9]+'?[a-zA-Z0-9]*", soup.get_text())]
+    hrefs = [link.get('href') for link in soup.find_all('a')]
+    return soup.get_text(), words, hrefs
+
+
+def stream_extract(content):
+    page = parse_page(content)
+    return page.text, page.words, page.hrefs
+
+
+def measure(extract, pages):
+    start = time.perf_counter()
+    for content in pages:
+        extract(content)
+    return time.perf_counter() - start
+
+
+def main(corpus):
+    pages = load_corpus(corpus)
+    size = sum(len(content) for content in pages) / 2**20
+    mismatches = sum(
+        soup_extract(content) != stream_extract(content) for content in pages)
+    print(f"{len(pages)} pages, {size:.1f} MB, {mismatches} mismatches")
+    print(f"{'extractor':>14} {'pages/sec':>10} {'MB/sec':>8}")
+    for name, extract in (("BeautifulSoup", soup_extract),
+                          ("parse_page", stream_extract)):
+        elapsed = measure(extract, pages)
+        print(f"{name:>14} {len(pages) / elapsed:>10.1f} {size / elapsed:>8.2f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None)
+    args = parser.parse_args()
+    main(args.corpus)
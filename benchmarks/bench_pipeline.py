@@ -0,0 +1,73 @@
+''' Pages per second of the pipeline engine's parse stage for 1, 2, 4, ...
+parser processes on a saved-page corpus, against scraper.analyze_page
+inline on one thread (the threads engine), with the mean time one page
+spends in scraper.analyze_page.
+
+    python -m benchmarks.bench_pipeline [--corpus DIR_OF_SAVED_PAGES] --processes 1 2 4
+
+Scaling is only near-linear up to the number of cores.
+'''
+import os
+import time
+
+from argparse import ArgumentParser
+from threading import Thread
+
+from benchmarks.corpus import load_corpus
+from crawler.pipeline import ParseStage, analyze
+
+
+def inline(pages):
+    parse = 0.0
+    start = time.perf_counter()
+    for url, content in pages:
+        analysis, seconds = analyze(url, content)
+        parse += seconds
+    return len(pages) / (time.perf_counter() - start), parse / len(pages)
+
+
+def staged(pages, processes, queue_size):
+    stage = ParseStage(processes, queue_size).start()
+    try:
+        # wait until every process is up, spawning is not part of the crawl
+        for i in range(processes):
+            stage.submit(f"https://www.ics.uci.edu/warmup/{i}", b"<html></html>")
+        for _ in range(processes):
+            stage.get()
+        parse = 0.0
+        start = time.perf_counter()
+        feeder = Thread(
+            target=lambda: [stage.submit(*page) for page in pages], daemon=True)
+        feeder.start()
+        for _ in pages:
+            url, analysis, seconds, error = stage.get()
+            assert error is None, error
+            parse += seconds
+        elapsed = time.perf_counter() - start
+        feeder.join()
+        stage.stop()
+    finally:
+        stage.close()
+    return len(pages) / elapsed, parse / len(pages)
+
+
+def main(corpus, count, processes, queue_size):
+    pages = [
+        (f"https://www.ics.uci.edu/page/{i}", content)
+        for i, content in enumerate(load_corpus(corpus, count))]
+    print(f"{len(pages)} pages, {os.cpu_count()} cpus")
+    print(f"{'processes':>10} {'pages/s':>10} {'speedup':>8} {'parse ms':>9}")
+    base, parse = inline(pages)
+    print(f"{'inline':>10} {base:>10.1f} {1.0:>8.2f} {parse * 1000:>9.2f}")
+    for count in processes:
+        rate, parse = staged(pages, count, queue_size)
+        print(f"{count:>10} {rate:>10.1f} {rate / base:>8.2f} {parse * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--count", type=int, default=500)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--queue", type=int, default=64)
+    args = parser.parse_args()
+    main(args.corpus, args.count, args.processes, args.queue)
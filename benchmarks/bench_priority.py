@@ -0,0 +1,77 @@
+''' How fast a crawl of a synthetic site with traps and near duplicates finds
+its real pages, with the best-first frontier (BESTFIRST, crawler/priority.py)
+and without it: the real pages found after a quarter, half, ... of the
+downloads, and the downloads it took to find 90% of them. The fetch order
+comes from the crawl's page store.
+
+    python -m benchmarks.bench_priority --hosts 20 --pages 30 --threads 1
+'''
+import os
+import sys
+import tempfile
+import subprocess
+
+from argparse import ArgumentParser
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.corpus import TrapSite
+from benchmarks.harness import ROOT, write_config
+from benchmarks.registration_server import RegistrationServer
+from utils.page_store import PageStore
+
+
+def fetch_order(site, registration, best_first, threads, politeness):
+    with tempfile.TemporaryDirectory() as cwd:
+        write_config(
+            os.path.join(ROOT, "config.ini"),
+            [f"CRAWLER.POLITENESS={politeness}", f"THREADCOUNT={threads}",
+             f"BESTFIRST={best_first}", "PAGESTORE=pages", "STATS=false"],
+            registration.address, site.seed_urls(),
+            os.path.join(cwd, "config.ini"))
+        subprocess.run(
+            [sys.executable, os.path.join(ROOT, "launch.py"), "--restart"],
+            cwd=cwd, env=dict(os.environ, PYTHONPATH=ROOT),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        store = PageStore(os.path.join(cwd, "pages"))
+        order = [page[0] for page in store.pages()]
+        store.close()
+    return order
+
+
+def main(hosts, pages, latency, politeness, threads):
+    site = TrapSite(hosts, pages)
+    cache = CacheServer(site, latency=latency).start()
+    registration = RegistrationServer(cache.address).start()
+    print(f"{hosts} hosts x {pages} pages, {threads} threads, "
+          f"{politeness}s politeness")
+    try:
+        for best_first in (False, True):
+            order = fetch_order(site, registration, best_first, threads, politeness)
+            found = list()
+            real = 0
+            for url in order:
+                real += site.kind(url) == "page"
+                found.append(real)
+            quarters = [
+                found[max(0, len(order) * q // 4 - 1)] for q in range(1, 5)]
+            to_90 = next(
+                i + 1 for i, count in enumerate(found)
+                if count >= 0.9 * found[-1])
+            print(f"best first {'on ' if best_first else 'off'}: "
+                  f"{len(order)} downloads, real pages after 25/50/75/100%: "
+                  f"{'/'.join(str(count) for count in quarters)}, "
+                  f"90% of them after {to_90} downloads")
+    finally:
+        registration.stop()
+        cache.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.005)
+    parser.add_argument("--politeness", type=float, default=0.01)
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+    main(args.hosts, args.pages, args.latency, args.politeness, args.threads)
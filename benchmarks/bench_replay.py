@@ -0,0 +1,70 @@
+''' A crawl of a synthetic site through the local cache server, then
+launch.py --replay of its page store: time of both and whether the replayed
+report is the same as the crawled one.
+
+    python -m benchmarks.bench_replay --hosts 10 --pages 50 --processes 1 2
+'''
+import os
+import sys
+import time
+import tempfile
+import subprocess
+
+from argparse import ArgumentParser
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.corpus import TrapSite
+from benchmarks.harness import ROOT, write_config
+from benchmarks.registration_server import RegistrationServer
+from utils.page_store import PageStore
+
+
+def launch(cwd, *args):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, os.path.join(ROOT, "launch.py"), *args],
+        cwd=cwd, env=dict(os.environ, PYTHONPATH=ROOT),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return time.perf_counter() - start
+
+
+def main(hosts, pages, latency, politeness, processes):
+    site = TrapSite(hosts, pages)
+    cache = CacheServer(site, latency=latency).start()
+    registration = RegistrationServer(cache.address).start()
+    with tempfile.TemporaryDirectory() as cwd:
+        write_config(
+            os.path.join(ROOT, "config.ini"),
+            [f"CRAWLER.POLITENESS={politeness}", "THREADCOUNT=1"],
+            registration.address, site.seed_urls(),
+            os.path.join(cwd, "config.ini"))
+        crawl = launch(cwd, "--restart")
+        registration.stop()
+        cache.stop()
+        with open(os.path.join(cwd, "report.txt")) as report:
+            crawled = report.read()
+        store = PageStore(os.path.join(cwd, "pages"))
+        sizes = store.stats()
+        store.close()
+        print(f"crawl: {sizes['pages']} pages in {crawl:.1f}s "
+              f"({politeness}s politeness, {latency * 1000:.0f}ms latency)")
+        print(f"page store: {sizes['bodies']} bodies, "
+              f"{sizes['bytes'] / 2 ** 20:.1f}MB -> "
+              f"{sizes['compressed_bytes'] / 2 ** 20:.1f}MB compressed")
+        for count in processes:
+            elapsed = launch(cwd, "--replay", "--processes", str(count))
+            with open(os.path.join(cwd, "report.txt")) as report:
+                same = report.read() == crawled
+            print(f"replay, {count} processes: {elapsed:.1f}s, "
+                  f"report {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--hosts", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--politeness", type=float, default=0.5)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2])
+    args = parser.parse_args()
+    main(args.hosts, args.pages, args.latency, args.politeness, args.processes)
@@ -0,0 +1,131 @@
+''' Per-page cost of recording report statistics as the crawl grows.
+
+Compares ReportStore against the old approach of reading and rewriting the
+whole report_data.json for every page, then records from several threads
+at once and times top_words(50) against sorting the whole vocabulary.
+
+    python -m benchmarks.bench_report --pages 20000 --legacy-pages 2000 \
+        --threads 1 4 8
+'''
+import os
+import json
+import time
+import random
+import tempfile
+
+from argparse import ArgumentParser
+from threading import Thread
+from collections import Counter
+from itertools import accumulate
+
+from utils.report import ReportStore
+
+
+def synthetic_pages(count, words_per_page=400, vocabulary=50000, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(vocabulary)]
+    # zipf-ish: low indices are much more frequent than the tail
+    cum_weights = list(accumulate(1.0 / (i + 1) for i in range(vocabulary)))
+    for i in range(count):
+        words = rng.choices(vocab, cum_weights=cum_weights, k=words_per_page)
+        host = f"sub{rng.randrange(100)}.ics.uci.edu"
+        yield f"https://{host}/page/{i}", words, host
+
+
+def legacy_record(path, url, words, subdomain):
+    with open(path, "r") as readfile:
+        data = json.loads(readfile.read())
+    data['unique_links'] = set(data['unique_links'])
+    data['unique_links'].add(url)
+    if data['max_words'] < len(words):
+        data['max_words'] = len(words)
+        data['max_word_link'] = url
+    for tok in words:
+        data['frequency_dict'][tok] = data['frequency_dict'].get(tok, 0) + 1
+    data['domainList'][subdomain] = data['domainList'].get(subdomain, 0) + 1
+    data['unique_links'] = list(data['unique_links'])
+    with open(path, "w") as outfile:
+        json.dump(data, outfile)
+
+
+def run(label, pages, record, window):
+    print(f"{label}")
+    print(f"{'pages':>10} {'us/page':>10}")
+    start = time.perf_counter()
+    for i, (url, words, host) in enumerate(pages, 1):
+        record(url, words, host)
+        if i % window == 0:
+            now = time.perf_counter()
+            print(f"{i:>10} {(now - start) / window * 1e6:>10.1f}")
+            start = now
+
+
+def concurrent(path, pages, threads):
+    ''' Pages/sec of `threads` threads recording `pages` pages together. '''
+    store = ReportStore(path)
+    store.reset()
+    batches = [
+        [(url, len(words), Counter(words), host) for url, words, host
+         in synthetic_pages(pages // threads, seed=t)]
+        for t in range(threads)]
+
+    def work(batch):
+        for page in batch:
+            store.record_page(*page)
+
+    workers = [Thread(target=work, args=(batch,)) for batch in batches]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    store.flush()
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    top = store.top_words(50)
+    top_time = time.perf_counter() - start
+    start = time.perf_counter()
+    full = sorted(
+        store.frequencies.counts.items(), key=lambda x: (-x[1], x[0]))[:50]
+    sort_time = time.perf_counter() - start
+    assert top == full
+    store.close()
+    return pages // threads * threads / elapsed, top_time, sort_time
+
+
+def main(pages, legacy_pages, window, threads):
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ReportStore(os.path.join(tmp, "report_data"))
+        run("ReportStore (delta log + snapshots)", synthetic_pages(pages),
+            lambda url, words, host: store.record_page(
+                url, len(words), Counter(words), host),
+            window)
+        store.close()
+
+        legacy_file = os.path.join(tmp, "legacy.json")
+        with open(legacy_file, "w") as outfile:
+            json.dump({
+                'frequency_dict': {}, 'unique_links': [],
+                'max_word_link': '', 'max_words': -1, 'domainList': {}},
+                outfile)
+        run("Full report_data.json rewrite", synthetic_pages(legacy_pages),
+            lambda url, words, host: legacy_record(
+                legacy_file, url, words, host),
+            max(legacy_pages // 10, 1))
+
+        print(f"{'threads':>8} {'pages/s':>10} {'top_words':>10} {'full sort':>10}")
+        for count in threads:
+            rate, top_time, sort_time = concurrent(
+                os.path.join(tmp, f"threads{count}"), pages, count)
+            print(f"{count:>8} {rate:>10.0f} {top_time * 1e6:>8.0f}us "
+                  f"{sort_time * 1e6:>8.0f}us")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20000)
+    parser.add_argument("--legacy-pages", type=int, default=2000)
+    parser.add_argument("--window", type=int, default=2000)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+    main(args.pages, args.legacy_pages, args.window, args.threads)
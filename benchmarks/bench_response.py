@@ -0,0 +1,96 @@
+''' Decoding and parsing a mix of cache server answers, the way the crawl
+sees them: html pages, 404s, pdfs and a few multi-MB pages. The old eager
+Response unpickled every answer and parsed every 200; the lazy one skips
+error answers, non-html content types and oversized pages, and parses at
+most PARSESIZE bytes.
+
+    python -m benchmarks.bench_response --answers 2000 --big-mb 4
+'''
+import time
+import pickle
+import random
+import tracemalloc
+
+from argparse import ArgumentParser
+
+from benchmarks.corpus import random_text, html_page
+from benchmarks.cache_server import raw_response
+from utils.response import Response
+import scraper
+
+
+def answers(count, big_mb, seed=0):
+    ''' Answer dicts as they come out of cbor: 80% html, 10% 404, 8% pdf
+    and 2% html pages of big_mb megabytes. '''
+    rng = random.Random(seed)
+    page = html_page("page", random_text(rng), [f"/p{i}" for i in range(20)])
+    big = html_page(
+        "big", random_text(rng, paragraphs=int(big_mb * 3000)), ["/p0"])
+    pdf = bytes(rng.getrandbits(8) for _ in range(200000))
+    result = list()
+    for i in range(count):
+        url = f"https://www.ics.uci.edu/{i}"
+        roll = rng.random()
+        if roll < 0.8:
+            status, body, content_type = 200, page, "text/html; charset=utf-8"
+        elif roll < 0.9:
+            status, body, content_type = 404, b"not found", "text/html"
+        elif roll < 0.98:
+            status, body, content_type = 200, pdf, "application/pdf"
+        else:
+            status, body, content_type = 200, big, "text/html"
+        result.append({
+            "url": url, "status": status,
+            "response": raw_response(url, status, body, content_type)})
+    return result
+
+
+def eager(answer):
+    raw = pickle.loads(answer["response"])
+    if answer["status"] != 200:
+        return None
+    return scraper.analyze_page(answer["url"], raw.content)
+
+
+def lazy(answer, max_size, parse_size):
+    content = scraper.page_content(Response(answer, max_size, parse_size))
+    if content is None:
+        return None
+    return scraper.analyze_page(answer["url"], content)
+
+
+def measure(decode, batch):
+    start = time.perf_counter()
+    for answer in batch:
+        decode(answer)
+    elapsed = time.perf_counter() - start
+    # tracing slows the parser down a lot, so the peak is a separate run over
+    # a slice that still holds a few big pages
+    tracemalloc.start()
+    for answer in batch[:max(len(batch) // 10, 1)]:
+        decode(answer)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed / len(batch), peak
+
+
+def main(count, big_mb, max_size, parse_size):
+    batch = answers(count, big_mb)
+    size = sum(len(answer["response"]) for answer in batch)
+    print(f"{count} answers, {size / 2 ** 20:.0f}MB pickled")
+    old, old_peak = measure(eager, batch)
+    new, new_peak = measure(
+        lambda answer: lazy(answer, max_size, parse_size), batch)
+    print(f"eager: {old * 1e6:8.0f}us/answer, peak {old_peak / 2 ** 20:6.1f}MB")
+    print(f"lazy:  {new * 1e6:8.0f}us/answer, peak {new_peak / 2 ** 20:6.1f}MB "
+          f"(MAXPAGESIZE {max_size}, PARSESIZE {parse_size})")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--big-mb", type=float, default=4)
+    parser.add_argument("--max-size", type=int, default=8000000)
+    parser.add_argument("--parse-size", type=int, default=1000000)
+    args = parser.parse_args()
+    main(args.answers, args.big_mb, args.max_size, args.parse_size)
@@ -0,0 +1,108 @@
+''' Time until a resumed crawl can hand out its first url, on a synthetic
+save file: the Frontier, which queues the pending urls a chunk at a time,
+against the old startup that read every (url, completed) pair of the save
+file and ran is_valid on every pending one.
+
+    python -m benchmarks.bench_resume --urls 3000000 --pending 0.3
+'''
+import os
+import time
+import random
+import tempfile
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from crawler.frontier import Frontier
+from crawler.scheduler import HostScheduler
+from crawler.seen import SeenSet
+from crawler.store import FrontierStore
+from scraper import is_valid
+from utils import get_urlhash
+from utils.config import Config
+
+
+def url(i):
+    return f"https://host{i % 500}.ics.uci.edu/page/{i}"
+
+
+def build(path, urls, pending, seed=0):
+    ''' A save file of `urls` urls of which a fraction `pending` is not
+    completed, with the checkpoint of its seen urls, like a crawl that was
+    stopped. '''
+    rng = random.Random(seed)
+    store = FrontierStore(path)
+    seen = SeenSet(f"{path}.seen", store_id=store.store_id)
+    conn = store._conn
+    with store._lock:
+        store.commit()
+        conn.execute("BEGIN")
+        for start in range(0, urls, 100000):
+            rows = list()
+            for i in range(start, min(start + 100000, urls)):
+                urlhash = get_urlhash(url(i))
+                seen.add(urlhash)
+                rows.append((i + 1, urlhash, url(i), int(rng.random() >= pending)))
+            conn.executemany(
+                "INSERT INTO urls (rowid, hash, url, completed) VALUES (?, ?, ?, ?)",
+                rows)
+            conn.executemany(
+                "INSERT INTO pending (id, url) VALUES (?, ?)",
+                [(rowid, link) for rowid, _, link, completed in rows if not completed])
+        conn.execute("COMMIT")
+    seen.checkpoint(urls)
+    store.close()
+
+
+def old_startup(path, delay):
+    ''' Frontier._parse_save_file before the pending table. '''
+    save = FrontierStore(path)
+    scheduler = HostScheduler(delay)
+    total_count = len(save)
+    tbd_count = 0
+    for link, completed in save.values():
+        if not completed and is_valid(link):
+            scheduler.add(link)
+            tbd_count += 1
+    first = scheduler.get()
+    save.close()
+    return first
+
+
+def new_startup(config):
+    frontier = Frontier(config, False)
+    first = frontier.get_tbd_url()
+    frontier.save.close()
+    return first
+
+
+def main(urls, pending):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frontier.db")
+        start = time.perf_counter()
+        build(path, urls, pending)
+        print(f"built a save file of {urls} urls ({pending:.0%} pending) "
+              f"in {time.perf_counter() - start:.1f}s, "
+              f"{os.path.getsize(path) / 2 ** 20:.0f}MB")
+        cparser = ConfigParser()
+        cparser.read_dict({
+            "IDENTIFICATION": {"USERAGENT": "IR benchmark"},
+            "CONNECTION": {"HOST": "localhost", "PORT": "0"},
+            "CRAWLER": {"SEEDURL": url(0), "POLITENESS": "0.5"},
+            "LOCAL PROPERTIES": {"SAVE": path, "THREADCOUNT": "1"}})
+        config = Config(cparser)
+        for name, startup in [
+                ("old", lambda: old_startup(path, config.time_delay)),
+                ("new", lambda: new_startup(config))]:
+            start = time.perf_counter()
+            first = startup()
+            assert first is not None
+            print(f"{name}: first url after {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=3000000)
+    parser.add_argument("--pending", type=float, default=0.3)
+    args = parser.parse_args()
+    main(args.urls, args.pending)
@@ -0,0 +1,53 @@
+''' Crawl throughput of the per-host scheduler for a growing number of
+distinct hosts. Downloads are simulated with a fixed latency, so pages/sec
+should grow with the number of hosts until the workers are saturated.
+
+    python -m benchmarks.bench_scheduler --workers 8 --delay 0.05
+'''
+import time
+
+from argparse import ArgumentParser
+from threading import Thread
+
+from crawler.scheduler import HostScheduler
+
+
+def crawl(hosts, pages_per_host, workers, delay, latency):
+    scheduler = HostScheduler(delay)
+    for h in range(hosts):
+        for p in range(pages_per_host):
+            scheduler.add(f"https://host{h}.ics.uci.edu/page/{p}")
+
+    def work():
+        while True:
+            url = scheduler.get()
+            if url is None:
+                return
+            time.sleep(latency)
+            scheduler.done(url)
+
+    threads = [Thread(target=work) for _ in range(workers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return hosts * pages_per_host / (time.perf_counter() - start)
+
+
+def main(workers, delay, latency, pages_per_host):
+    print(f"workers={workers} delay={delay}s latency={latency}s")
+    print(f"{'hosts':>6} {'pages/sec':>10}")
+    for hosts in (1, 2, 4, 8, 16):
+        rate = crawl(hosts, pages_per_host, workers, delay, latency)
+        print(f"{hosts:>6} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.05)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--pages-per-host", type=int, default=20)
+    args = parser.parse_args()
+    main(args.workers, args.delay, args.latency, args.pages_per_host)
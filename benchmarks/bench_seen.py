@@ -0,0 +1,123 @@
+''' Duplicate checks per second and bytes per url of the frontier's seen
+set: SeenSet (bloom filter + sorted 8 byte digests) against a lookup in the
+FrontierStore (SQLite) and in the old shelve save file.
+
+    python -m benchmarks.bench_seen --urls 10000000
+
+Half of the lookups are urls that were added (the common case for outlinks),
+half are new. The shelve is only filled with --shelve-urls urls, it is too
+slow to build at full size.
+'''
+import os
+import time
+import shelve
+import random
+import tempfile
+
+from argparse import ArgumentParser
+
+from crawler.seen import SeenSet
+from crawler.store import FrontierStore
+from utils import get_urlhash
+
+
+def url(i):
+    return f"https://www.ics.uci.edu/page/{i}"
+
+
+def lookups(contains, count, known, seed=0):
+    rng = random.Random(seed)
+    hashes = [
+        get_urlhash(url(rng.randrange(known) if i % 2 else known + i))
+        for i in range(count)]
+    start = time.perf_counter()
+    hits = sum(1 for urlhash in hashes if contains(urlhash))
+    elapsed = time.perf_counter() - start
+    assert hits == count // 2, hits
+    return count / elapsed
+
+
+def file_size(path):
+    return sum(
+        os.path.getsize(path + suffix)
+        for suffix in ("", "-wal", "-shm", ".bloom", ".db", ".dat", ".dir")
+        if os.path.exists(path + suffix))
+
+
+def rss():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def bench_seen(tmp, urls, count):
+    path = os.path.join(tmp, "frontier.db.seen")
+    before = rss()
+    seen = SeenSet(path)
+    start = time.perf_counter()
+    for i in range(urls):
+        seen.add(get_urlhash(url(i)))
+    adds = urls / (time.perf_counter() - start)
+    seen.checkpoint(urls)
+    memory = rss() - before
+    rate = lookups(seen.__contains__, count, urls)
+    del seen
+    start = time.perf_counter()
+    loaded = SeenSet(path)
+    load = time.perf_counter() - start
+    assert len(loaded) == urls
+    return adds, rate, memory / urls, file_size(path) / urls, load
+
+
+def bench_store(tmp, urls, count):
+    path = os.path.join(tmp, "frontier.db")
+    before = rss()
+    store = FrontierStore(path, commit_batch=100000)
+    start = time.perf_counter()
+    for i in range(urls):
+        store.add(get_urlhash(url(i)), url(i))
+    store.commit()
+    adds = urls / (time.perf_counter() - start)
+    memory = rss() - before
+    rate = lookups(store.__contains__, count, urls)
+    store.close()
+    return adds, rate, memory / urls, file_size(path) / urls
+
+
+def bench_shelve(tmp, urls, count):
+    path = os.path.join(tmp, "frontier.shelve")
+    before = rss()
+    save = shelve.open(path)
+    start = time.perf_counter()
+    for i in range(urls):
+        save[get_urlhash(url(i))] = (url(i), False)
+    save.sync()
+    adds = urls / (time.perf_counter() - start)
+    memory = rss() - before
+    rate = lookups(save.__contains__, count, urls)
+    save.close()
+    return adds, rate, memory / urls, file_size(path) / urls
+
+
+def main(urls, shelve_urls, count):
+    print(f"{'':>14} {'urls':>9} {'adds/s':>8} {'lookups/s':>10} "
+          f"{'rss B/url':>10} {'disk B/url':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        adds, rate, memory, disk, load = bench_seen(tmp, urls, count)
+        print(f"{'SeenSet':>14} {urls:>9} {adds:>8.0f} {rate:>10.0f} "
+              f"{memory:>10.1f} {disk:>11.1f}")
+        adds, rate, memory, disk = bench_store(tmp, urls, count)
+        print(f"{'FrontierStore':>14} {urls:>9} {adds:>8.0f} {rate:>10.0f} "
+              f"{memory:>10.1f} {disk:>11.1f}")
+        adds, rate, memory, disk = bench_shelve(tmp, shelve_urls, count)
+        print(f"{'shelve':>14} {shelve_urls:>9} {adds:>8.0f} {rate:>10.0f} "
+              f"{memory:>10.1f} {disk:>11.1f}")
+    print(f"SeenSet checkpoint of {urls} urls reloaded in {load * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--urls", type=int, default=1000000)
+    parser.add_argument("--shelve-urls", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+    main(args.urls, args.shelve_urls, args.lookups)
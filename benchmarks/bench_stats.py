@@ -0,0 +1,80 @@
+''' Cost of the crawl instrumentation: a timer plus a counter per call with
+stats disabled and enabled against a bare loop, and scraper.scraper over
+synthetic pages with stats disabled and enabled.
+
+    python -m benchmarks.bench_stats --calls 1000000 --pages 2000
+'''
+import os
+import time
+import tempfile
+
+from argparse import ArgumentParser
+
+from benchmarks.corpus import SyntheticSite
+from benchmarks.cache_server import raw_response
+from utils.response import Response
+from utils.stats import stats
+
+
+def micro(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        pass
+    bare = time.perf_counter() - start
+    timings = dict()
+    for enabled in (False, True):
+        stats.reset()
+        stats.enabled = enabled
+        start = time.perf_counter()
+        for _ in range(calls):
+            with stats.timer("bench"):
+                pass
+            stats.incr("bench")
+        timings[enabled] = (time.perf_counter() - start - bare) / calls
+    stats.disable()
+    return timings
+
+
+def crawl(pages):
+    import scraper
+    site = SyntheticSite(hosts=20, pages=max(pages // 20, 1))
+    responses = list()
+    for h in range(site.hosts):
+        for i in range(site.pages):
+            url = site.url(h, i)
+            status, body, content_type = site(url)
+            responses.append((url, Response({
+                "url": url, "status": status,
+                "response": raw_response(url, status, body, content_type)})))
+    timings = dict()
+    for enabled in (False, True):
+        scraper.report_stats.reset()
+        scraper.near_duplicates.reset()
+        stats.reset()
+        stats.enabled = enabled
+        start = time.perf_counter()
+        for url, resp in responses:
+            scraper.scraper(url, resp)
+        timings[enabled] = (time.perf_counter() - start) / len(responses)
+    stats.disable()
+    return timings
+
+
+def main(calls, pages):
+    timings = micro(calls)
+    print(f"timer + counter: {timings[False] * 1e9:.0f}ns disabled, "
+          f"{timings[True] * 1e9:.0f}ns enabled")
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        timings = crawl(pages)
+    print(f"scraper.scraper per page: {timings[False] * 1e6:.0f}us disabled, "
+          f"{timings[True] * 1e6:.0f}us enabled "
+          f"({(timings[True] / timings[False] - 1) * 100:+.1f}%)")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1000000)
+    parser.add_argument("--pages", type=int, default=2000)
+    args = parser.parse_args()
+    main(args.calls, args.pages)
@@ -0,0 +1,115 @@
+''' Urls checked per second by utils.url_filter against the old is_valid,
+which rebuilt and re-ran every regex on each call. Urls come from a
+frontier save file, a text file with one url per line, or are synthetic.
+
+    python -m benchmarks.bench_url_filter --frontier frontier.db --count 2000000
+'''
+import re
+import time
+import random
+
+from argparse import ArgumentParser
+from urllib.parse import urlparse
+
+from crawler.store import FrontierStore
+from utils.url_filter import filter_urls
+
+
+def legacy_is_valid(url, trap_subdomain_urls):
+    parsed = urlparse(url)
+    if parsed is None or parsed.hostname is None:
+        return False
+    if parsed.scheme not in set(["http", "https"]):
+        return False
+    valid_suffix_list = [r'^.+\.ics\.uci\.edu.*$', r'^.+\.cs\.uci\.edu.*$',
+                         r'^.+\.informatics\.uci\.edu.*$', r'^.+\.stat\.uci\.edu.*$']
+    if all([re.match(domain, parsed.hostname) == None for domain in valid_suffix_list]):
+        return False
+    trap_detection_patterns = [r'.*/appointment.*', r'.*/calendar.*']
+    if any(re.match(pattern, parsed.path.lower()) != None for pattern in trap_detection_patterns):
+        return False
+    if re.match(r'^.*?(/.+?/).*?\1.*$', parsed.path.lower()) != None:
+        return False
+    trap_patterns = [r'.*swiki.*', r'.*wiki.*', r'.*elms.*', r'.*gitlab.*']
+    if any(re.match(pattern, parsed.hostname.lower()) != None for pattern in trap_patterns):
+        no_q = url.split('?')[0]
+        if trap_subdomain_urls.get(no_q, 0) > 5:
+            return False
+        else:
+            trap_subdomain_urls[no_q] = trap_subdomain_urls.get(no_q, 0) + 1
+    if re.match(r'.*gitlab.*', parsed.hostname.lower()) != None:
+        gitlab_filters = [r'.*/commits/.*', r'.*/commit/.*', r'.*/graphs/.*',
+                          r'.*/network/.*', r'.*/tree/.*', r'.*/raw/.*',
+                          r'.*/find_file/.*', r'.*/blame/.*', r'.*/tags(/.*)?$',
+                          r'.*/incidents(/.*)?$']
+        if any(re.match(pattern, parsed.path.lower()) != None for pattern in gitlab_filters):
+            return False
+    if re.match(r'.*datasets.php.*', parsed.path.lower()) != None and re.match(f'.*format=.*', parsed.query) != None:
+        return False
+    return not re.match(
+        r".*\.(css|js|bmp|gif|jpe?g|ico"
+        + r"|png|tiff?|mid|mp2|mp3|mp4"
+        + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
+        + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
+        + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
+        + r"|epub|dll|cnf|tgz|sha1"
+        + r"|thmx|mso|arff|rtf|jar|csv"
+        + r"|mpe?g|ppsx|img|war|py|java|c|asm|atom|apk|rs|ds_store|git"
+        + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
+
+
+def synthetic_urls(count, seed=0):
+    rng = random.Random(seed)
+    hosts = ["www.ics.uci.edu", "www.cs.uci.edu", "swiki.ics.uci.edu",
+             "gitlab.ics.uci.edu", "www.stat.uci.edu", "www.informatics.uci.edu",
+             "archive.ics.uci.edu", "www.google.com"]
+    segments = ["people", "research", "courses", "~faculty", "news", "events",
+                "calendar", "tree", "master", "doku.php", "datasets.php",
+                "paper.pdf", "index.html", "slides.pptx", "2019", "cs121"]
+    queries = ["", "", "", "?id=1", "?do=edit", "?format=mat", "?rev=3"]
+    return [
+        f"https://{rng.choice(hosts)}/"
+        + "/".join(rng.choice(segments) for _ in range(rng.randint(1, 6)))
+        + rng.choice(queries)
+        for _ in range(count)]
+
+
+def load_urls(frontier, urls_file, count):
+    if frontier:
+        urls = [url for url, _ in FrontierStore(frontier).values()]
+    elif urls_file:
+        with open(urls_file) as lines:
+            urls = [line.strip() for line in lines if line.strip()]
+    else:
+        urls = synthetic_urls(min(count, 100000))
+    # repeat the dump until there are `count` urls
+    return (urls * (count // len(urls) + 1))[:count]
+
+
+def main(frontier, urls_file, count, legacy_count):
+    urls = load_urls(frontier, urls_file, count)
+    reasons = dict()
+    start = time.perf_counter()
+    valid = filter_urls(urls, reasons)
+    elapsed = time.perf_counter() - start
+    print(f"url_filter: {len(urls)} urls in {elapsed:.2f}s, "
+          f"{len(urls) / elapsed:,.0f} urls/sec, {len(valid)} valid")
+    for reason, rejected in sorted(reasons.items(), key=lambda x: -x[1]):
+        print(f"    {reason:>15} {rejected:>10}")
+    legacy = urls[:legacy_count]
+    start = time.perf_counter()
+    for url in legacy:
+        legacy_is_valid(url, dict())
+    elapsed = time.perf_counter() - start
+    print(f"old is_valid: {len(legacy)} urls in {elapsed:.2f}s, "
+          f"{len(legacy) / elapsed:,.0f} urls/sec")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--frontier", type=str, default=None)
+    parser.add_argument("--urls", type=str, default=None)
+    parser.add_argument("--count", type=int, default=1000000)
+    parser.add_argument("--legacy-count", type=int, default=100000)
+    args = parser.parse_args()
+    main(args.frontier, args.urls, args.count, args.legacy_count)
@@ -0,0 +1,94 @@
+''' Local stand-in for the spacetime cache server: answers
+GET /?q=<url>&u=<useragent> with a cbor encoded dict holding a pickled
+requests.Response, like utils.download expects.
+
+    server = CacheServer(site, latency=0.01)
+    server.start()
+    config.cache_server = server.address
+'''
+import time
+import cbor
+import pickle
+import random
+
+from threading import Thread
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import requests
+
+
+def raw_response(url, status, body, content_type="text/html"):
+    ''' A pickled requests.Response, as the cache server sends it. '''
+    resp = requests.models.Response()
+    resp.url = url
+    resp.status_code = status
+    resp._content = body
+    resp.headers["Content-Type"] = content_type
+    resp.encoding = None
+    return pickle.dumps(resp)
+
+
+class CacheServer(object):
+    ''' site(url) returns (status, body, content_type) or None for urls
+    that do not exist. latency is added to every request, and a fraction
+    `error_rate` of the requests fails with a 503 from the cache itself. '''
+
+    def __init__(self, site, latency=0.0, error_rate=0.0, port=0, seed=0):
+        self.site = site
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self.users = set()
+        rng = random.Random(seed)
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # headers and body go out as separate writes, without this the
+            # client's delayed ack stalls every keep-alive request by ~40ms
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                url = query.get("q", [""])[0]
+                server.requests += 1
+                server.users.update(query.get("u", []))
+                if server.latency:
+                    time.sleep(server.latency)
+                if rng.random() < server.error_rate:
+                    self._send(503, b"")
+                    return
+                page = server.site(url)
+                if page is None:
+                    answer = {"url": url, "status": 404,
+                              "response": raw_response(url, 404, b"not found")}
+                else:
+                    status, body, content_type = page
+                    answer = {"url": url, "status": status,
+                              "response": raw_response(
+                                  url, status, body, content_type)}
+                self._send(200, cbor.dumps(answer))
+
+            def _send(self, status, body):
+                self.send_response(status)
+                self.send_header("Content-Type", "application/cbor")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self._thread = Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,273 @@
+''' Saved or synthetic pages and sites for the offline benchmarks. '''
+import os
+import json
+import random
+
+from urllib.parse import urlparse, parse_qs
+
+WORDS = (
+    "research computer uci data information ics students project news "
+    "events projects school science student faculty graduate machine "
+    "learning systems software informatics statistics course lecture "
+    "seminar paper algorithm network security vision database").split()
+
+
+def synthetic_page(rng, url, links, paragraphs=20):
+    ''' Build an html page about `url` with the given outlinks. '''
+    body = list()
+    for _ in range(paragraphs):
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80)))
+        body.append(f"<p>{sentence}</p>")
+    anchors = "\n".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+    return (
+        f"<!DOCTYPE html><html><head><title>{url}</title>"
+        f"<script>var page = '{url}';</script>"
+        f"<style>body {{ font-family: sans-serif; }}</style></head>"
+        f"<body><!-- generated -->{''.join(body)}<ul>{anchors}</ul>"
+        f"</body></html>").encode("utf-8")
+
+
+def load_corpus(path=None, count=500, seed=0):
+    ''' Contents of every file under `path`, or `count` synthetic pages of
+    varying size if no path is given. '''
+    if path:
+        pages = list()
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                with open(os.path.join(root, name), "rb") as page:
+                    pages.append(page.read())
+        return pages
+    rng = random.Random(seed)
+    return [
+        synthetic_page(
+            rng, f"https://www.ics.uci.edu/page/{i}",
+            [f"/page/{rng.randrange(count)}#top" for _ in range(rng.randint(5, 200))],
+            paragraphs=rng.choice([2, 20, 200]))
+        for i in range(count)]
+
+
+def random_text(rng, paragraphs=20, vocabulary=200):
+    ''' Paragraphs of random words from a vocabulary of its own, so texts
+    made with different rngs are never near duplicates. '''
+    words = [
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz")
+                for _ in range(rng.randint(3, 9)))
+        for _ in range(vocabulary)]
+    return [
+        " ".join(rng.choice(words) for _ in range(rng.randint(20, 80)))
+        for _ in range(paragraphs)]
+
+
+def html_page(title, paragraphs, links):
+    body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    anchors = "\n".join(f'<li><a href="{link}">{link}</a></li>' for link in links)
+    return (
+        f"<!DOCTYPE html><html><head><title>{title}</title></head>"
+        f"<body>{body}<ul>{anchors}</ul></body></html>").encode("utf-8")
+
+
+class SyntheticSite(object):
+    ''' A crawlable site of `hosts` hosts under ics.uci.edu with `pages`
+    pages each, for CacheServer. Every page links to the next page on its
+    host, so the whole site is reachable from the host roots, plus `links`
+    random pages of any host. Page text is random words, so no two pages are
+    near duplicates. '''
+
+    def __init__(self, hosts=50, pages=40, links=10, seed=0):
+        self.hosts = hosts
+        self.pages = pages
+        self.links = links
+        self.seed = seed
+        self._cache = dict()
+
+    def host(self, h):
+        return f"host{h}.ics.uci.edu"
+
+    def url(self, h, i):
+        return f"https://{self.host(h)}/page/{i}"
+
+    def seed_urls(self):
+        return [self.url(h, 0) for h in range(self.hosts)]
+
+    def __len__(self):
+        return self.hosts * self.pages
+
+    def _page(self, h, i):
+        rng = random.Random(f"{self.seed}/{h}/{i}")
+        paragraphs = random_text(rng)
+        links = [self.url(h, (i + 1) % self.pages)] + [
+            self.url(rng.randrange(self.hosts), rng.randrange(self.pages))
+            for _ in range(self.links)]
+        return html_page(f"{h}/{i}", paragraphs, links)
+
+    def __call__(self, url):
+        host, _, path = url.partition("://")[2].partition("/")
+        if not host.startswith("host") or not path.startswith("page/"):
+            return None
+        try:
+            h = int(host[4:].split(".")[0])
+            i = int(path[5:])
+        except ValueError:
+            return None
+        if not (0 <= h < self.hosts and 0 <= i < self.pages):
+            return None
+        if (h, i) not in self._cache:
+            self._cache[(h, i)] = self._page(h, i)
+        return 200, self._cache[(h, i)], "text/html"
+
+
+class TrapSite(SyntheticSite):
+    ''' SyntheticSite plus the kinds of urls that waste a crawl, each at
+    most `trap_depth` deep so a crawl of the site always ends:
+
+      calendar  /calendar/<day> pages linking to the next day
+      events    /events?day=<day>, the same as a query no filter knows
+      gitlab    gitlab.ics.uci.edu/repo<r>/-/tree/<sha>/<dir> trees
+      wiki      wiki.ics.uci.edu/doku.php?id=<page>&rev=<rev> revisions
+      print     /page/<i>/print, a near duplicate of every page
+
+    kind(url) tells which urls are real pages, traps or duplicates, for the
+    crawl quality numbers. '''
+
+    def __init__(self, hosts=50, pages=40, links=10, seed=0, trap_depth=50):
+        super().__init__(hosts, pages, links, seed)
+        self.trap_depth = trap_depth
+
+    def _page(self, h, i):
+        rng = random.Random(f"{self.seed}/{h}/{i}")
+        paragraphs = random_text(rng)
+        links = [self.url(h, (i + 1) % self.pages), f"{self.url(h, i)}/print"] + [
+            self.url(rng.randrange(self.hosts), rng.randrange(self.pages))
+            for _ in range(self.links)]
+        host = self.host(h)
+        if i % 5 == 0:
+            links.append(f"https://{host}/calendar/0")
+        if i % 7 == 0:
+            links.append(f"https://{host}/events?day=0")
+        if i % 11 == 0:
+            links.append(f"https://gitlab.ics.uci.edu/repo{h}/-/tree/{i:040x}/d0")
+        if i % 13 == 0:
+            links.append(f"https://wiki.ics.uci.edu/doku.php?id=h{h}p{i}&rev=0")
+        return html_page(f"{h}/{i}", paragraphs, links)
+
+    def _print_page(self, h, i):
+        # the page's text with a footer and without the links
+        rng = random.Random(f"{self.seed}/{h}/{i}")
+        paragraphs = random_text(rng) + ["printer friendly version"]
+        return html_page(f"{h}/{i} (print)", paragraphs, list())
+
+    def _trap_page(self, url, depth, next_url):
+        rng = random.Random(f"{self.seed}/{url}")
+        links = [next_url] if depth + 1 < self.trap_depth else list()
+        return html_page(url, random_text(rng, paragraphs=5), links)
+
+    def _resolve(self, url):
+        ''' (kind, body) of url, or None if it does not exist. '''
+        parsed = urlparse(url)
+        host = parsed.hostname or ""
+        path = parsed.path
+        query = parse_qs(parsed.query)
+        try:
+            if host == "gitlab.ics.uci.edu":
+                repo, _, tree, sha, directory = path.strip("/").split("/")
+                depth = int(directory[1:])
+                if tree != "tree" or depth >= self.trap_depth:
+                    return None
+                return "trap", self._trap_page(
+                    url, depth, f"https://{host}/{repo}/-/tree/{sha}/d{depth + 1}")
+            if host == "wiki.ics.uci.edu":
+                # no rev is the current revision, as in dokuwiki
+                page, rev = query["id"][0], int(query.get("rev", ["0"])[0])
+                if rev >= self.trap_depth:
+                    return None
+                return "trap", self._trap_page(
+                    url, rev, f"https://{host}{path}?id={page}&rev={rev + 1}")
+            if not host.startswith("host"):
+                return None
+            h = int(host[4:].split(".")[0])
+            if not 0 <= h < self.hosts:
+                return None
+            if path.startswith("/calendar/"):
+                day = int(path[len("/calendar/"):])
+                if day >= self.trap_depth:
+                    return None
+                return "trap", self._trap_page(
+                    url, day, f"https://{host}/calendar/{day + 1}")
+            if path == "/events":
+                day = int(query["day"][0])
+                if day >= self.trap_depth:
+                    return None
+                return "trap", self._trap_page(
+                    url, day, f"https://{host}/events?day={day + 1}")
+            if path.startswith("/page/"):
+                i, _, suffix = path[len("/page/"):].partition("/")
+                i = int(i)
+                if not 0 <= i < self.pages or suffix not in ("", "print"):
+                    return None
+                if suffix == "print":
+                    return "duplicate", self._print_page(h, i)
+                if (h, i) not in self._cache:
+                    self._cache[(h, i)] = self._page(h, i)
+                return "page", self._cache[(h, i)]
+        except (ValueError, KeyError):
+            return None
+        return None
+
+    def kind(self, url):
+        resolved = self._resolve(url)
+        return resolved[0] if resolved else None
+
+    def __call__(self, url):
+        resolved = self._resolve(url)
+        if resolved is None:
+            return None
+        return 200, resolved[1], "text/html"
+
+
+class RecordedSite(object):
+    ''' A site saved to a directory: index.json maps every url to
+    [status, file, content type, kind], kind being "page", "trap" or
+    "duplicate" (or null if unknown), and the files hold the bodies.
+    RecordedSite.save(site, urls, path) records any site. '''
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "index.json")) as index:
+            self.index = json.load(index)
+        self.seeds = self.index.pop("__seeds__", list())
+
+    def seed_urls(self):
+        return list(self.seeds)
+
+    def __len__(self):
+        return sum(1 for entry in self.index.values() if entry[3] == "page")
+
+    def kind(self, url):
+        entry = self.index.get(url)
+        return entry[3] if entry else None
+
+    def __call__(self, url):
+        entry = self.index.get(url)
+        if entry is None:
+            return None
+        status, name, content_type, _ = entry
+        with open(os.path.join(self.path, name), "rb") as body:
+            return status, body.read(), content_type
+
+    @staticmethod
+    def save(site, urls, path):
+        ''' Record `urls` of site (and its seeds) to the directory path. '''
+        os.makedirs(path, exist_ok=True)
+        index = {"__seeds__": site.seed_urls()}
+        kind = getattr(site, "kind", lambda url: None)
+        for number, url in enumerate(urls):
+            page = site(url)
+            if page is None:
+                continue
+            status, body, content_type = page
+            name = f"{number}.html"
+            with open(os.path.join(path, name), "wb") as saved:
+                saved.write(body)
+            index[url] = [status, name, content_type, kind(url)]
+        with open(os.path.join(path, "index.json"), "w") as saved:
+            json.dump(index, saved)
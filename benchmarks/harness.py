@@ -0,0 +1,162 @@
+''' End-to-end crawl benchmark that needs no network: a local registration
+node and cache server (benchmarks/registration_server.py,
+benchmarks/cache_server.py) serve a synthetic site with traps and near
+duplicates (benchmarks.corpus.TrapSite) or a recorded one, and the crawler
+runs through launch.main with any config.ini plus overrides.
+
+    python -m benchmarks.harness --config config.ini --set ENGINE=async \
+        --hosts 20 --pages 50 --latency 0.02
+    python -m benchmarks.harness --corpus DIR_OF_A_RECORDED_SITE
+    python -m benchmarks.harness --record DIR   # save the synthetic site
+
+Reports pages/sec, cpu time, peak rss and crawl quality: coverage of the
+real pages, fetches wasted on traps and near duplicates, and near
+duplicates that made it into the report.
+'''
+import os
+import sys
+import json
+import time
+import tempfile
+import resource
+import subprocess
+
+from argparse import ArgumentParser
+from configparser import ConfigParser
+
+from benchmarks.cache_server import CacheServer
+from benchmarks.corpus import TrapSite, RecordedSite
+from benchmarks.registration_server import RegistrationServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_config(config_file, overrides, registration, seeds, path):
+    ''' config_file with `overrides` ("KEY=VALUE" or "SECTION.KEY=VALUE")
+    applied, pointed at the local registration node and the site's seeds. '''
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    for override in overrides:
+        key, _, value = override.partition("=")
+        section, _, key = key.rpartition(".")
+        if not section:
+            section = next(
+                (name for name in cparser.sections() if key in cparser[name]),
+                "LOCAL PROPERTIES")
+        if section not in cparser:
+            cparser.add_section(section)
+        cparser[section][key] = value
+    cparser["CONNECTION"]["HOST"] = registration[0]
+    cparser["CONNECTION"]["PORT"] = str(registration[1])
+    cparser["CRAWLER"]["SEEDURL"] = ",".join(seeds)
+    with open(path, "w") as config:
+        cparser.write(config)
+
+
+def crawl():
+    ''' Runs in the subprocess, in the temporary working directory. '''
+    import launch
+    import scraper
+    from crawler.store import FrontierStore
+    from utils.config import Config
+
+    start = time.perf_counter()
+    launch.main("config.ini", True)
+    elapsed = time.perf_counter() - start
+    cparser = ConfigParser()
+    cparser.read("config.ini")
+    store = FrontierStore(Config(cparser).save_file)
+    fetched = [url for url, completed in store.values() if completed]
+    store.close()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return {
+        "seconds": elapsed,
+        "cpu": own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime,
+        "max_rss": max(own.ru_maxrss, children.ru_maxrss) * 1024,
+        "fetched": fetched,
+        "reported": list(scraper.report_stats.unique_links)
+    }
+
+
+def run_crawl(site, config_file="config.ini", overrides=(), latency=0.0,
+              error_rate=0.0):
+    ''' Crawl site with the given configuration, return the metrics and the
+    fetched urls. '''
+    cache = CacheServer(site, latency=latency, error_rate=error_rate).start()
+    registration = RegistrationServer(cache.address).start()
+    try:
+        with tempfile.TemporaryDirectory() as cwd:
+            write_config(
+                config_file, overrides, registration.address,
+                site.seed_urls(), os.path.join(cwd, "config.ini"))
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.harness", "--child"],
+                cwd=cwd, env=dict(os.environ, PYTHONPATH=ROOT),
+                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True)
+    finally:
+        registration.stop()
+        cache.stop()
+    run = json.loads(result.stdout.decode().strip().splitlines()[-1])
+    kinds = dict()
+    for url in run["fetched"]:
+        kind = site.kind(url)
+        kinds[kind] = kinds.get(kind, 0) + 1
+    metrics = {
+        "pages_per_sec": len(run["fetched"]) / run["seconds"],
+        "seconds": run["seconds"],
+        "cpu_seconds": run["cpu"],
+        "peak_rss_mb": run["max_rss"] / 2 ** 20,
+        "fetched": len(run["fetched"]),
+        "coverage": kinds.get("page", 0) / len(site),
+        "trap_fetches": kinds.get("trap", 0),
+        "duplicate_fetches": kinds.get("duplicate", 0),
+        "missing_fetches": kinds.get(None, 0),
+        "duplicates_reported": sum(
+            1 for url in run["reported"] if site.kind(url) == "duplicate"),
+        "cache_requests": cache.requests
+    }
+    return metrics, run["fetched"]
+
+
+def main(args):
+    if args.corpus:
+        site = RecordedSite(args.corpus)
+    else:
+        site = TrapSite(args.hosts, args.pages, seed=args.seed,
+                        trap_depth=args.trap_depth)
+    overrides = [f"CRAWLER.POLITENESS={args.politeness}"] + args.set
+    metrics, fetched = run_crawl(
+        site, args.config, overrides, args.latency, args.error_rate)
+    if args.record:
+        # every page plus the traps and duplicates this crawl fetched
+        RecordedSite.save(site, sorted(set(fetched).union(
+            site.url(h, i) for h in range(site.hosts)
+            for i in range(site.pages))), args.record)
+    print(f"{len(site)} pages, {args.latency * 1000:.0f}ms cache latency, "
+          f"overrides {' '.join(overrides)}")
+    for name, value in metrics.items():
+        print(f"{name:>20} {value:.3f}" if isinstance(value, float)
+              else f"{name:>20} {value}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--config", type=str, default=os.path.join(ROOT, "config.ini"))
+    parser.add_argument("--set", type=str, action="append", default=list(),
+                        help="KEY=VALUE or SECTION.KEY=VALUE config override")
+    parser.add_argument("--corpus", type=str, default=None)
+    parser.add_argument("--record", type=str, default=None)
+    parser.add_argument("--hosts", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--trap-depth", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--politeness", type=float, default=0.05)
+    parser.add_argument("--child", action="store_true", default=False)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(crawl()))
+    else:
+        main(args)
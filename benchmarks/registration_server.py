@@ -0,0 +1,44 @@
+''' Local stand-in for the spacetime registration node that
+utils.server_registration.get_cache_server talks to: every crawler that
+registers is sent to `cache_server`.
+
+    registration = RegistrationServer(cache.address).start()
+    HOST, PORT = registration.address
+'''
+from multiprocessing import Process
+
+from spacetime import Node
+
+from utils.pcc_models import Register
+
+
+def _assign(df, cache_server):
+    while True:
+        try:
+            df.checkout_await(1)
+        except TimeoutError:
+            continue
+        assigned = False
+        for reg in df.read_all(Register):
+            if not reg.load_balancer:
+                reg.load_balancer = tuple(cache_server)
+                assigned = True
+        if assigned:
+            df.commit()
+
+
+class RegistrationServer(object):
+    def __init__(self, cache_server):
+        self.cache_server = tuple(cache_server)
+        self._node = Node(_assign, Types=[Register], server_port=0)
+        self.address = None
+
+    def start(self):
+        self._node.start_async(self.cache_server)
+        self.address = tuple(self._node.details)
+        return self
+
+    def stop(self):
+        self._node.terminate()
+        # the node's own join() waits for a return value that never comes
+        Process.join(self._node, 5)
@@ -1,19 +1,36 @@
 from utils import get_logger
+from utils.stats import stats, StatsReporter
 from crawler.frontier import Frontier
 from crawler.worker import Worker
+from crawler.async_worker import AsyncWorker
+from crawler.pipeline import ParsePipeline
 
 class Crawler(object):
     def __init__(self, config, restart, frontier_factory=Frontier, worker_factory=Worker):
         self.config = config
         self.logger = get_logger("CRAWLER")
+        self.stats_reporter = None
+        if config.stats:
+            stats.enable()
+            self.stats_reporter = StatsReporter(
+                config.stats_file, config.stats_interval, config.stats_port)
         self.frontier = frontier_factory(config, restart)
         self.workers = list()
         self.worker_factory = worker_factory
 
     def start_async(self):
-        self.workers = [
-            self.worker_factory(worker_id, self.config, self.frontier)
-            for worker_id in range(self.config.threads_count)]
+        if self.config.engine == "async":
+            # One event loop thread does all the fetching.
+            self.workers = [AsyncWorker(self.config, self.frontier)]
+        elif self.config.engine == "pipeline":
+            # Fetch threads, parser processes and one writer thread.
+            self.workers = [ParsePipeline(self.config, self.frontier)]
+        else:
+            self.workers = [
+                self.worker_factory(worker_id, self.config, self.frontier)
+                for worker_id in range(self.config.threads_count)]
+        if self.stats_reporter is not None:
+            self.stats_reporter.start()
         for worker in self.workers:
             worker.start()
 
@@ -24,3 +41,5 @@ class Crawler(object):
     def join(self):
         for worker in self.workers:
             worker.join()
+        if self.stats_reporter is not None:
+            self.stats_reporter.stop()
@@ -0,0 +1,170 @@
+import time
+import asyncio
+
+from collections import deque
+from threading import Thread
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from utils import get_logger
+from utils.async_download import AsyncDownloadClient
+from utils.page_store import get_page_store
+from utils.stats import stats
+from crawler.pipeline import analyze
+import scraper
+
+
+class AsyncWorker(Thread):
+    ''' Runs the whole crawl on one asyncio event loop: `async_fetches`
+    coroutines download concurrently over a non-blocking keep-alive client,
+    and the CPU heavy scraper.analyze_page runs in a pool of
+    `parse_processes` processes. Duplicate detection, the report and the
+    frontier stay in this process. Politeness is enforced by the frontier
+    exactly as for the threaded Worker.
+
+    The event loop only waits on the network and the frontier's scheduler.
+    Decoding, storing and unpickling a page, parsing it without processes,
+    and recording it (dedup, report, outlinks, completion: locks and SQLite)
+    run on the loop's default thread pool.
+
+    Fetchers without a url wait for a wake-up instead of polling the
+    frontier. A fetcher that gets a url wakes one idle fetcher, since more
+    may be ready, and only one idle fetcher at a time waits for the next
+    host to come off its politeness delay. '''
+
+    def __init__(self, config, frontier):
+        self.logger = get_logger("AsyncWorker", "Worker")
+        self.config = config
+        self.frontier = frontier
+        # futures of the idle fetchers, first in first woken
+        self._idle = deque()
+        # when the fetcher waiting for the next host wakes up by itself
+        self._deadline = float("inf")
+        super().__init__(daemon=True)
+
+    def run(self):
+        asyncio.run(self._crawl())
+        self.logger.info("Frontier is empty. Stopping Crawler.")
+
+    async def _crawl(self):
+        client = AsyncDownloadClient(
+            self.config.cache_server, self.config.user_agent,
+            self.config.download_timeout, self.config.download_retries,
+            self.config.download_backoff, self.config.async_fetches,
+            self.config.max_page_size, self.config.parse_size,
+            get_page_store(self.config))
+        pool = None
+        if self.config.parse_processes:
+            pool = ProcessPoolExecutor(
+                self.config.parse_processes, mp_context=get_context("spawn"))
+        try:
+            await asyncio.gather(*[
+                self._fetch_loop(client, pool)
+                for _ in range(self.config.async_fetches)])
+        finally:
+            await client.close()
+            if pool is not None:
+                pool.shutdown()
+
+    def _wake(self, count=None):
+        ''' Wake up `count` idle fetchers, all of them if None. '''
+        while self._idle and (count is None or count > 0):
+            waiter = self._idle.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                if count is not None:
+                    count -= 1
+
+    async def _wait(self, wait):
+        ''' Wait for a wake-up, or `wait` seconds if no other fetcher is
+        waiting for a host that frees up as soon. '''
+        waiter = asyncio.get_running_loop().create_future()
+        self._idle.append(waiter)
+        deadline = time.monotonic() + wait
+        timeout = None
+        if deadline < self._deadline:
+            self._deadline = deadline
+            timeout = wait
+        try:
+            await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            if waiter in self._idle:
+                self._idle.remove(waiter)
+        finally:
+            if timeout is not None and self._deadline == deadline:
+                self._deadline = float("inf")
+
+    async def _fetch_loop(self, client, pool):
+        loop = asyncio.get_running_loop()
+        while True:
+            tbd_url, wait = self.frontier.poll_tbd_url()
+            if tbd_url is None:
+                if wait is None:
+                    # the crawl is over, for the idle fetchers too
+                    self._wake()
+                    return
+                await self._wait(wait)
+                continue
+            self._wake(1)
+            try:
+                status, body = await client.get(tbd_url)
+            except Exception:
+                self.logger.exception(f"Failed to download {tbd_url}.")
+                await loop.run_in_executor(None, self._record, tbd_url, None)
+                continue
+            if pool is None:
+                # everything after the download is one job on a thread
+                await loop.run_in_executor(
+                    None, self._scrape, client, tbd_url, status, body)
+                continue
+            analysis = None
+            content = await loop.run_in_executor(
+                None, self._content, client, tbd_url, status, body)
+            if content is not None:
+                try:
+                    analysis, seconds = await loop.run_in_executor(
+                        pool, analyze, tbd_url, content)
+                    stats.observe("parse", seconds)
+                except Exception:
+                    self.logger.exception(f"Failed to parse {tbd_url}.")
+            await loop.run_in_executor(None, self._record, tbd_url, analysis)
+
+    def _content(self, client, url, status, body):
+        ''' The page to parse, from the cache server's answer: decoded,
+        stored, unpickled and cut to PARSESIZE. None if there is nothing to
+        parse. '''
+        try:
+            resp = client.response(url, status, body, self.logger)
+            self.logger.info(
+                f"Downloaded {url}, status <{resp.status}>, "
+                f"using cache {self.config.cache_server}.")
+            return scraper.page_content(resp)
+        except Exception:
+            self.logger.exception(f"Failed to process {url}.")
+            return None
+
+    def _scrape(self, client, url, status, body):
+        ''' _content, the parse and _record in one go, for parsing on
+        threads. '''
+        analysis = None
+        content = self._content(client, url, status, body)
+        if content is not None:
+            try:
+                analysis, seconds = analyze(url, content)
+                stats.observe("parse", seconds)
+            except Exception:
+                self.logger.exception(f"Failed to parse {url}.")
+        self._record(url, analysis)
+
+    def _record(self, url, analysis):
+        ''' Same as scraper.scrape from the parse on, and the completion of
+        the url. '''
+        useful = False
+        try:
+            useful = scraper.keep_page(url, analysis)
+            if useful:
+                for scraped_url in scraper.filter_links(analysis['links']):
+                    self.frontier.add_url(scraped_url, url)
+        except Exception:
+            self.logger.exception(f"Failed to process {url}.")
+        self.frontier.mark_url_complete(url, useful)
@@ -0,0 +1,277 @@
+import json
+import time
+
+from functools import lru_cache
+from hashlib import sha256
+from multiprocessing import Process
+from threading import Thread, Lock, Condition, Event
+from uuid import uuid4
+
+from spacetime import Node, Dataframe
+
+from utils import get_logger, get_urlhash
+from utils.canonical import canonicalize
+from utils.pcc_models import Outlinks, CrawlNode, NodeReport
+from utils.stats import stats
+from crawler.frontier import Frontier
+from crawler.scheduler import get_host
+from crawler.seen import SeenSet
+
+CLUSTER_TYPES = [Outlinks, CrawlNode, NodeReport]
+
+
+@lru_cache(maxsize=65536)
+def host_owner(host, nodes):
+    ''' The node that crawls `host`: a hash that is the same in every
+    process, unlike hash(). '''
+    return int.from_bytes(sha256(host.encode("utf-8")).digest()[:8], "big") % nodes
+
+
+def owner(url, nodes):
+    return host_owner(get_host(url), nodes)
+
+
+def _serve(df):
+    # The dataframe is served while the node runs, there is nothing to do.
+    while True:
+        try:
+            df.checkout_await(1)
+        except TimeoutError:
+            continue
+
+
+class DataframeServer(object):
+    ''' The spacetime dataframe the nodes of a partitioned crawl share,
+    served on `port` (0 picks a free one, see address after start()). '''
+
+    def __init__(self, port=0):
+        self._node = Node(_serve, Types=CLUSTER_TYPES, server_port=port)
+        self.address = None
+
+    def start(self):
+        self._node.start_async()
+        self.address = tuple(self._node.details)
+        return self
+
+    def join(self):
+        Process.join(self._node)
+
+    def stop(self):
+        self._node.terminate()
+        # the node's own join() waits for a return value that never comes
+        Process.join(self._node, 5)
+
+
+class Cluster(object):
+    ''' This node's link to the other nodes of a partitioned crawl.
+
+    Every node owns the hosts that hash to its index (host_owner), so each
+    host is crawled, and kept polite, by exactly one node. Outlinks to
+    hosts of other nodes are collected by forward() and added to the
+    dataframe as one Outlinks batch per node every `sync_interval`
+    seconds; the same sync pulls the batches addressed to this node into
+    its frontier and deletes them.
+
+    The crawl is over when every node has run out of work and every batch
+    sent has been received. Each node publishes its counts in its CrawlNode;
+    node 0 declares the end once it has seen all nodes idle with the same
+    counts twice, from a newer sync of every node the second time (a node
+    only gets work again by receiving a batch, which changes the counts),
+    and the others stop when they see it. '''
+
+    def __init__(self, config):
+        self.logger = get_logger("CLUSTER")
+        self.index = config.node_index
+        self.nodes = config.nodes
+        self.sync_interval = config.sync_interval
+        self.frontier = None
+        self.finished = Event()
+        self._lock = Lock()
+        self._delivered = Condition()
+        self._outbox = dict()
+        # Urls already sent, so an outlink found on many pages is sent once.
+        self._forwarded = SeenSet()
+        self._last_counts = None
+        self._thread = None
+        self.df = Dataframe(
+            f"crawler-node-{self.index}", CLUSTER_TYPES,
+            details=(config.dataframe_host, config.dataframe_port))
+        state = self.df.read_one(CrawlNode, self.index)
+        if state is None:
+            self.df.add_one(CrawlNode, CrawlNode(self.index))
+        else:
+            # A restarted node keeps its counts, the other nodes' counts
+            # include the batches it sent and received before.
+            state.idle = False
+            state.finished = False
+        report = self.df.read_one(NodeReport, self.index)
+        if report is not None:
+            self.df.delete_one(NodeReport, report)
+        self.df.commit()
+        self.df.push_await()
+        self.logger.info(
+            f"Node {self.index} of {self.nodes}, dataframe at "
+            f"{config.dataframe_host}:{config.dataframe_port}.")
+
+    def owns(self, url):
+        return owner(url, self.nodes) == self.index
+
+    def forward(self, url, depth):
+        ''' Send url to the node that owns its host, with the next batch. '''
+        urlhash = get_urlhash(url)
+        with self._lock:
+            if urlhash in self._forwarded:
+                return
+            self._forwarded.add(urlhash)
+            self._outbox.setdefault(
+                owner(url, self.nodes), list()).append((url, depth))
+        stats.incr("urls_forwarded")
+
+    def start(self, frontier):
+        self.frontier = frontier
+        self._thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def wait(self):
+        ''' Wait up to one sync for batches to arrive. False once the crawl
+        is over. '''
+        with self._delivered:
+            if not self.finished.is_set():
+                self._delivered.wait(self.sync_interval)
+        return not self.finished.is_set()
+
+    def _run(self):
+        while not self.finished.is_set():
+            start = time.monotonic()
+            try:
+                self._sync()
+            except Exception:
+                self.logger.exception("Failed to sync with the dataframe.")
+            with self._delivered:
+                self._delivered.notify_all()
+            time.sleep(max(0, self.sync_interval - (time.monotonic() - start)))
+
+    def _sync(self):
+        with self._lock:
+            outbox, self._outbox = self._outbox, dict()
+        state = self.df.read_one(CrawlNode, self.index)
+        for node, links in outbox.items():
+            urls, depths = zip(*links)
+            self.df.add_one(Outlinks, Outlinks(
+                uuid4().hex, node, self.index, list(urls), list(depths)))
+            state.sent += 1
+        self.df.pull()
+        received = 0
+        for batch in self.df.read_all(Outlinks):
+            if batch.node != self.index:
+                continue
+            for url, depth in zip(batch.urls, batch.depths):
+                self.frontier.add_owned_url(url, depth)
+            received += len(batch.urls)
+            self.df.delete_one(Outlinks, batch)
+            state.received += 1
+        if received:
+            stats.incr("urls_received", received)
+        # The frontier is checked first: once nothing is in flight, no
+        # worker can add to the outbox any more.
+        idle = self.frontier.idle()
+        with self._lock:
+            idle = idle and not self._outbox
+        state.idle = idle
+        state.syncs += 1
+        if self.index == 0 and self._crawl_over():
+            self.logger.info("Every node is out of work, the crawl is over.")
+            state.finished = True
+        self.df.commit()
+        self.df.push_await()
+        coordinator = self.df.read_one(CrawlNode, 0)
+        if coordinator is not None and coordinator.finished:
+            self.finished.set()
+
+    def _crawl_over(self):
+        states = sorted(self.df.read_all(CrawlNode), key=lambda s: s.node)
+        if len(states) < self.nodes or not all(s.idle for s in states):
+            self._last_counts = None
+            return False
+        counts = [(s.sent, s.received) for s in states]
+        syncs = [s.syncs for s in states]
+        if self._last_counts is None or self._last_counts[0] != counts:
+            # the first look, kept until every node has synced again
+            self._last_counts = (counts, syncs)
+            return False
+        return (
+            sum(s.sent for s in states) == sum(s.received for s in states)
+            and all(now > then for now, then in zip(syncs, self._last_counts[1])))
+
+    def stop(self):
+        self.finished.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def merge_reports(self, report, merged):
+        ''' Publish this node's report statistics. On node 0, wait for
+        the reports of all nodes and return them merged into the ReportStore
+        `merged`; other nodes return their own `report`. Hosts are crawled
+        by one node each, so a url is never counted twice. Near duplicates
+        are not: every node has its own fingerprint index, so near duplicate
+        pages on hosts of different nodes are each kept and counted. '''
+        self.stop()
+        self.df.add_one(NodeReport, NodeReport(self.index, json.dumps(report.snapshot())))
+        self.df.commit()
+        self.df.push_await()
+        if self.index != 0:
+            return report
+        while len(self.df.read_all(NodeReport)) < self.nodes:
+            try:
+                self.df.pull_await(1)
+            except TimeoutError:
+                continue
+        merged.reset()
+        for node_report in self.df.read_all(NodeReport):
+            merged.merge(json.loads(node_report.report))
+        self.logger.info(
+            f"Merged the reports of {self.nodes} nodes: "
+            f"{len(merged.unique_links)} unique pages.")
+        return merged
+
+
+class PartitionedFrontier(Frontier):
+    ''' The Frontier of one node of a partitioned crawl (see Cluster): it
+    only queues urls of the hosts this node owns and forwards the others.
+    Running out of urls does not end the crawl until every node has. '''
+
+    def __init__(self, config, restart):
+        # seeds of the other nodes are forwarded by Frontier.__init__
+        self.cluster = Cluster(config)
+        super().__init__(config, restart)
+        self.cluster.start(self)
+
+    def add_url(self, url, parent=None):
+        url = canonicalize(url)
+        depth = self._child_depth(parent)
+        if self.cluster.owns(url):
+            self._add(url, depth)
+        else:
+            self.cluster.forward(url, depth)
+
+    def add_owned_url(self, url, depth):
+        ''' Queue a url another node forwarded. '''
+        self._add(url, depth)
+
+    def idle(self):
+        ''' Whether this node has nothing queued, in flight or left to
+        resume. '''
+        with self._resume_lock:
+            return not self._resuming() and self.to_be_downloaded.idle()
+
+    def get_tbd_url(self):
+        while True:
+            url = super().get_tbd_url()
+            if url is not None or not self.cluster.wait():
+                return url
+
+    def poll_tbd_url(self):
+        url, wait = super().poll_tbd_url()
+        if url is None and wait is None and not self.cluster.finished.is_set():
+            return None, self.cluster.sync_interval
+        return url, wait
@@ -1,72 +1,213 @@
 import os
-import shelve
 
-from threading import Thread, RLock
-from queue import Queue, Empty
+from threading import Lock
 
-from utils import get_logger, get_urlhash, normalize
-from scraper import is_valid
+from utils import get_logger, get_urlhash
+from utils.canonical import canonicalize
+from utils.stats import stats
+from utils.url_filter import TRAP_QUERY
+from scraper import is_valid, report_stats
+from crawler.scheduler import HostScheduler
+from crawler.store import FrontierStore
+from crawler.seen import SeenSet
+from crawler.traps import TrapDetector
+from crawler.priority import PriorityModel
+
+# Pending urls of a resumed crawl are read from the save file this many at a
+# time, whenever fewer than half that many are queued.
+RESUME_CHUNK = 10000
 
 class Frontier(object):
     def __init__(self, config, restart):
         self.logger = get_logger("FRONTIER")
         self.config = config
-        self.to_be_downloaded = list()
+        # Pending urls of the save file with ids up to _resume_end that are
+        # not queued yet come after _resume_cursor, a (rank, id) position in
+        # best-first order. _resume_end is 0 once they are all queued.
+        self._resume_lock = Lock()
+        self._resume_cursor = None
+        self._resume_end = 0
+        # Link depth from the seeds of every queued and in-flight url.
+        self._depths = dict()
         
         if not os.path.exists(self.config.save_file) and not restart:
             # Save file does not exist, but request to load save.
             self.logger.info(
                 f"Did not find save file {self.config.save_file}, "
                 f"starting from seed.")
+            # The seen urls of the deleted save file.
+            SeenSet.remove(self._seen_file())
         elif os.path.exists(self.config.save_file) and restart:
             # Save file does exists, but request to start from seed.
             self.logger.info(
                 f"Found save file {self.config.save_file}, deleting it.")
-            os.remove(self.config.save_file)
+            FrontierStore.remove(self.config.save_file)
+            SeenSet.remove(self._seen_file())
         # Load existing save file, or create one if it does not exist.
-        self.save = shelve.open(self.config.save_file)
-        if restart:
+        # Writes are batched, see SAVEINTERVAL and SAVEBATCH in config.ini.
+        # The pages in the workers' report shards are logged before every
+        # commit, so a url saved as complete is never missing from the report.
+        self.save = FrontierStore(
+            self.config.save_file, self.config.save_interval,
+            self.config.save_batch, report_stats.flush)
+        # Query variant counts per path on trap hosts, kept in the save file.
+        self.traps = TrapDetector(self.save)
+        # Scores urls by depth, trap likelihood and the yield of their host
+        # and path prefix, learned from mark_url_complete feedback.
+        self.priority = PriorityModel(self.save, self.traps)
+        # Per-host queues that enforce the politeness delay for each host,
+        # best first unless BESTFIRST is off.
+        self.to_be_downloaded = HostScheduler(
+            self.config.time_delay,
+            self.priority.estimate if self.config.best_first else None)
+        stats.gauge("frontier_queued", self.to_be_downloaded.__len__)
+        stats.gauge("frontier_in_flight", self.to_be_downloaded.in_flight)
+        stats.gauge("frontier_hosts", self.to_be_downloaded.hosts)
+        # Every urlhash in the save file, in memory. The last checkpoint is
+        # memory-mapped and the urls added since are read back from the save.
+        self.seen = SeenSet(self._seen_file(), store_id=self.save.store_id)
+        for urlhash in self.save.hashes(self.seen.rowid):
+            self.seen.add(urlhash)
+        self._checkpointed = len(self.seen)
+        # A new crawl, whether restarted or without a save file: what other
+        # files keep about the last crawl (report, fingerprints) is stale.
+        self.from_seed = restart or not self.save
+        if self.from_seed:
             for url in self.config.seed_urls:
                 self.add_url(url)
         else:
             # Set the frontier state with contents of save file.
             self._parse_save_file()
-            if not self.save:
-                for url in self.config.seed_urls:
-                    self.add_url(url)
+
+    def _seen_file(self):
+        return f"{self.config.save_file}.seen"
+
+    def checkpoint(self):
+        ''' Save the seen urls, so the next run can memory-map them. '''
+        self.seen.checkpoint(self.save.committed_rowid())
+        self._checkpointed = len(self.seen)
 
     def _parse_save_file(self):
-        ''' This function can be overridden for alternate saving techniques. '''
-        total_count = len(self.save)
-        tbd_count = 0
-        for url, completed in self.save.values():
-            if not completed and is_valid(url):
-                self.to_be_downloaded.append(url)
-                tbd_count += 1
+        ''' This function can be overridden for alternate saving techniques.
+        Only the first chunk of the pending urls is queued here, the rest as
+        the crawl goes (see _load_pending). '''
+        self._resume_end = self.save.last_pending_id()
+        tbd_count = self._load_pending()
         self.logger.info(
-            f"Found {tbd_count} urls to be downloaded from {total_count} "
-            f"total urls discovered.")
+            f"Queued {tbd_count} urls to be downloaded from the save file, "
+            f"the rest of the pending urls follow as needed.")
+
+    def _load_pending(self):
+        ''' Queue the next chunk of pending urls from the save file. Urls
+        added by this run have larger ids and are queued by add_url. '''
+        with self._resume_lock:
+            count = 0
+            while not count and self._resuming():
+                rows = self.save.pending(
+                    self._resume_cursor, self._resume_end, RESUME_CHUNK)
+                if not rows:
+                    self._resume_end = 0
+                for rank, urlid, url, depth in rows:
+                    self._resume_cursor = (rank, urlid)
+                    # the url filter may have changed since the url was saved
+                    if is_valid(url):
+                        self._depths[url] = depth
+                        self.to_be_downloaded.add(
+                            url, self.priority.weight(url, depth))
+                        count += 1
+            return count
+
+    def _resuming(self):
+        return self._resume_end > 0
+
+    def _exhausted(self):
+        ''' Whether the scheduler running dry is final: no chunk of the save
+        file is left, or being queued by another thread right now. '''
+        with self._resume_lock:
+            return not self._resuming() and not len(self.to_be_downloaded)
+
+    def _refill(self):
+        if self._resuming() and len(self.to_be_downloaded) < RESUME_CHUNK // 2:
+            self._load_pending()
 
     def get_tbd_url(self):
-        try:
-            return self.to_be_downloaded.pop()
-        except IndexError:
-            return None
+        ''' Blocks until some host is allowed to be hit again. Returns None
+        only when nothing is queued and no other worker has a url in flight
+        that could still add more. '''
+        while True:
+            self._refill()
+            url = self.to_be_downloaded.get()
+            if url is not None or self._exhausted():
+                break
+        if url is None:
+            # The crawl is over, do not wait for the next batch commit.
+            self.save.commit()
+        return url
+
+    def poll_tbd_url(self):
+        ''' Non-blocking get_tbd_url for event loop workers. Returns
+        (url, 0) if a url can be downloaded now, (None, seconds) if nothing
+        is ready yet, and (None, None) once the crawl is over. '''
+        while True:
+            self._refill()
+            url, wait = self.to_be_downloaded.poll()
+            if url is not None or wait is not None or self._exhausted():
+                break
+        if url is None and wait is None:
+            self.save.commit()
+        return url, wait
+
+    def _child_depth(self, parent):
+        # Seeds are at depth 0, outlinks one deeper than the in-flight url
+        # they were found on.
+        if parent is None:
+            return 0
+        return self._depths.get(parent, -1) + 1
+
+    def add_url(self, url, parent=None):
+        ''' parent is the url of the page url was found on, if any. '''
+        self._add(canonicalize(url), self._child_depth(parent))
 
-    def add_url(self, url):
-        url = normalize(url)
+    def _add(self, url, depth):
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
-            self.save[urlhash] = (url, False)
-            self.save.sync()
-            self.to_be_downloaded.append(url)
+        if urlhash in self.seen:
+            return
+        # Only urls that are new to the frontier count towards trap limits.
+        if not self.traps.admit(url):
+            # counted with the rejections of the url filter
+            stats.incr(f"rejected.{TRAP_QUERY}")
+            return
+        weight = self.priority.weight(url, depth)
+        # Check and insert in one step so two workers cannot both queue it.
+        # The rank orders the pending urls when the crawl is resumed.
+        with stats.timer("frontier_io"):
+            added = self.save.add(
+                urlhash, url, -weight * self.priority.estimate(url), depth)
+        self.seen.add(urlhash)
+        if added:
+            stats.incr("urls_discovered")
+            self._depths[url] = depth
+            self.to_be_downloaded.add(url, weight)
+            if len(self.seen) >= 2 * self._checkpointed + 100000:
+                # Checkpoints get rarer as the set grows, so writing them
+                # costs O(1) per url.
+                self.checkpoint()
     
-    def mark_url_complete(self, url):
+    def mark_url_complete(self, url, useful=None):
+        ''' useful tells whether the page was kept (see scraper.keep_page),
+        None if it is not known. '''
         urlhash = get_urlhash(url)
-        if urlhash not in self.save:
+        if useful is not None:
+            self.priority.feedback(url, useful)
+        stats.incr("pages")
+        with stats.timer("frontier_io"):
+            updated = self.save.mark_complete(urlhash, url)
+        if not updated:
             # This should not happen.
             self.logger.error(
                 f"Completed url {url}, but have not seen it before.")
 
-        self.save[urlhash] = (url, True)
-        self.save.sync()
+        # Its outlinks are added, so its depth is not needed any more.
+        self._depths.pop(url, None)
+        # Start the politeness delay of the url's host.
+        self.to_be_downloaded.done(url)
@@ -0,0 +1,167 @@
+import os
+import time
+
+from threading import Thread
+from multiprocessing import get_context
+
+from utils import get_logger
+from utils.download import download
+from utils.stats import stats
+import scraper
+
+
+def analyze(url, content):
+    ''' scraper.analyze_page and how long it took, for the parse time stats
+    of pages parsed in another process. '''
+    start = time.perf_counter()
+    analysis = scraper.analyze_page(url, content)
+    return analysis, time.perf_counter() - start
+
+
+def _parse_loop(tasks, results):
+    ''' Body of a parser process: analyze pages until the None sentinel. '''
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        url, content = task
+        try:
+            analysis, seconds = analyze(url, content)
+            results.put((url, analysis, seconds, None))
+        except Exception as e:
+            results.put((url, None, 0.0, f"{type(e).__name__}: {e}"))
+
+
+class ParseStage(object):
+    ''' `processes` parser processes running scraper.analyze_page. Pages go
+    in through submit(), which blocks while `queue_size` pages are waiting
+    (backpressure on the fetchers), and come out of get() as
+    (url, analysis, seconds, error) in completion order. '''
+
+    def __init__(self, processes, queue_size=64):
+        context = get_context("spawn")
+        self.tasks = context.Queue(queue_size)
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(
+                target=_parse_loop, args=(self.tasks, self.results), daemon=True)
+            for _ in range(processes)]
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        return self
+
+    def submit(self, url, content):
+        self.tasks.put((url, content))
+
+    def get(self, timeout=None):
+        ''' The next (url, analysis, seconds, error), None once stop() was
+        called. '''
+        return self.results.get(timeout=timeout)
+
+    def stop(self):
+        ''' Let the processes finish the submitted pages, then end them and
+        wake up whoever waits in get(). '''
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.results.put(None)
+
+    def close(self):
+        ''' End the processes right away, dropping the pages not parsed yet.
+        Safe after stop(), and the way out when a run failed. '''
+        self.tasks.cancel_join_thread()
+        for process in self.processes:
+            if process.is_alive():
+                process.terminate()
+        for process in self.processes:
+            process.join()
+
+
+class FetchWorker(Thread):
+    ''' Downloads pages and hands them to the parse stage. Urls that have
+    nothing to parse are completed right away, the others once the writer
+    has added their outlinks. '''
+
+    def __init__(self, worker_id, config, frontier, stage):
+        self.logger = get_logger(f"Worker-{worker_id}", "Worker")
+        self.config = config
+        self.frontier = frontier
+        self.stage = stage
+        super().__init__(daemon=True)
+
+    def run(self):
+        while True:
+            tbd_url = self.frontier.get_tbd_url()
+            if not tbd_url:
+                self.logger.info("Frontier is empty. Stopping Crawler.")
+                break
+            content = None
+            try:
+                resp = download(tbd_url, self.config, self.logger)
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.")
+                content = scraper.page_content(resp)
+                if content is not None:
+                    self.stage.submit(tbd_url, content)
+            except Exception:
+                self.logger.exception(f"Failed to process {tbd_url}.")
+                content = None
+            if content is None:
+                self.frontier.mark_url_complete(tbd_url, False)
+
+
+class ParsePipeline(Thread):
+    ''' Staged crawl: `threads_count` FetchWorkers download, a ParseStage of
+    `parse_processes` processes (default: one per cpu) parses, and this
+    thread is the single writer that records the results, adds the outlinks
+    to the frontier and completes the urls.
+
+    A url stays in flight in the frontier until its outlinks are added, so
+    the fetchers only run out of work once the whole crawl is done. '''
+
+    def __init__(self, config, frontier):
+        self.logger = get_logger("Pipeline", "Worker")
+        self.config = config
+        self.frontier = frontier
+        self.stage = ParseStage(
+            config.parse_processes or os.cpu_count() or 1, config.parse_queue)
+        self.fetchers = [
+            FetchWorker(worker_id, config, frontier, self.stage)
+            for worker_id in range(config.threads_count)]
+        stats.gauge("parse_queue", self.stage.tasks.qsize)
+        super().__init__(daemon=True)
+
+    def run(self):
+        self.stage.start()
+        for fetcher in self.fetchers:
+            fetcher.start()
+        stopper = Thread(target=self._stop_when_fetched, daemon=True)
+        stopper.start()
+        while True:
+            result = self.stage.get()
+            if result is None:
+                break
+            url, analysis, seconds, error = result
+            useful = False
+            try:
+                if error is not None:
+                    self.logger.error(f"Failed to parse {url}: {error}")
+                else:
+                    stats.observe("parse", seconds)
+                    useful = scraper.keep_page(url, analysis)
+                    if useful:
+                        for scraped_url in scraper.filter_links(analysis['links']):
+                            self.frontier.add_url(scraped_url, url)
+            except Exception:
+                self.logger.exception(f"Failed to process {url}.")
+            self.frontier.mark_url_complete(url, useful)
+        stopper.join()
+
+    def _stop_when_fetched(self):
+        for fetcher in self.fetchers:
+            fetcher.join()
+        self.stage.stop()
@@ -0,0 +1,97 @@
+from threading import Lock
+from urllib.parse import urlparse
+
+from utils.url_filter import is_trap_host
+
+# Every link between a seed and a url makes it this much less likely to be
+# worth its download: traps (calendars, revisions, trees) are long chains
+# of links, the pages of a site are a few links from its front page.
+DEPTH_DECAY = 0.9
+# How many downloads the yield estimate of the parent (the whole crawl for a
+# host, the host for a path prefix) counts for before a host or prefix has
+# downloads of its own.
+PRIOR_WEIGHT = 4
+# Trap likelihood of a url with a query string, and at most, for the query
+# variants of one path on a trap host (wikis, gitlab, ...).
+QUERY_TRAP = 0.2
+MAX_TRAP = 0.9
+# Directories of a path that make up its prefix.
+PREFIX_DEPTH = 2
+
+
+def yield_keys(url):
+    ''' The host and the path prefix (the host and at most PREFIX_DEPTH
+    directories) whose yield url counts towards. '''
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    directories = parsed.path.split("/")[1:-1]
+    return host, f"{host}/{'/'.join(directories[:PREFIX_DEPTH])}"
+
+
+class PriorityModel(object):
+    ''' Scores urls for the best-first frontier: higher is downloaded
+    first. The score of a url is the share of downloads under its path
+    prefix that gave a page worth keeping (one that passed the length and
+    near duplicate checks of scraper.keep_page), decayed by its link depth
+    from the seeds and cut by how likely it is to be a trap.
+
+    The yield estimates learn online from mark_url_complete feedback. A
+    prefix without downloads has its host's estimate, a host without
+    downloads the whole crawl's, and each counts as PRIOR_WEIGHT downloads
+    until the prefix or host has its own. The counts are written through
+    to the frontier store, so a resumed crawl keeps what it learned.
+
+    weight() is the part of the score that does not change once a url is
+    queued (depth and trap likelihood); estimate() is the part that does,
+    and is read again when the url gets near the front of its queue. '''
+
+    def __init__(self, store, traps):
+        self.store = store
+        self.traps = traps
+        self._lock = Lock()
+        # "" for the whole crawl, hostnames and path prefixes ->
+        # [downloads, pages kept]
+        self._counts = {
+            key: [downloads, kept] for key, downloads, kept in store.yields()}
+
+    def trap_likelihood(self, url):
+        path, _, query = url.partition("?")
+        if not query:
+            return 0.0
+        hostname = urlparse(url).hostname
+        if not hostname or not is_trap_host(hostname):
+            return QUERY_TRAP
+        # every further query variant of a path on a trap host is more
+        # likely one of an endless series (revisions, diffs, calendars)
+        share = min(1.0, self.traps.variants(path) / (self.traps.threshold + 1))
+        return QUERY_TRAP + (MAX_TRAP - QUERY_TRAP) * share
+
+    def weight(self, url, depth):
+        return DEPTH_DECAY ** depth * (1 - self.trap_likelihood(url))
+
+    def _estimate(self, key, prior):
+        counts = self._counts.get(key)
+        if counts is None:
+            return prior
+        downloads, kept = counts
+        return (kept + PRIOR_WEIGHT * prior) / (downloads + PRIOR_WEIGHT)
+
+    def estimate(self, url):
+        ''' Expected share of pages kept among downloads like url. '''
+        host, prefix = yield_keys(url)
+        with self._lock:
+            return self._estimate(
+                prefix, self._estimate(host, self._estimate("", 0.5)))
+
+    def score(self, url, depth):
+        return self.weight(url, depth) * self.estimate(url)
+
+    def feedback(self, url, useful):
+        ''' Count a download of url, useful if its page was kept. '''
+        keys = ("",) + yield_keys(url)
+        with self._lock:
+            for key in keys:
+                counts = self._counts.setdefault(key, [0, 0])
+                counts[0] += 1
+                counts[1] += int(useful)
+        self.store.add_yields(keys, useful)
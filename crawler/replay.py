@@ -0,0 +1,58 @@
+import os
+import time
+
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from utils import get_logger
+from utils.page_store import PageStore, stored_response
+from crawler.pipeline import analyze
+import scraper
+
+
+def replay(config, processes=0):
+    ''' Run the scraper over every page of config.page_store in fetch order,
+    without the cache server or the frontier: scraper.analyze_page runs in
+    `processes` processes (0 is one per cpu, 1 runs scraper.scraper in this
+    process) and the results are recorded here in order, as the pipeline
+    engine does. Returns the number of pages replayed. '''
+    logger = get_logger("Replay")
+    store = PageStore(config.page_store)
+    processes = processes or os.cpu_count() or 1
+    start = time.perf_counter()
+    replayed = 0
+    if processes == 1:
+        for page in store.pages():
+            scraper.scraper(page[0], stored_response(page, config.parse_size))
+            replayed += 1
+    else:
+        with ProcessPoolExecutor(
+                processes, mp_context=get_context("spawn")) as pool:
+            # a bounded window of pages in flight, results in fetch order
+            window = deque()
+            for page in store.pages():
+                content = scraper.page_content(
+                    stored_response(page, config.parse_size))
+                future = None
+                if content is not None:
+                    future = pool.submit(analyze, page[0], content)
+                window.append((page[0], future))
+                if len(window) >= 16 * processes:
+                    _record(*window.popleft())
+                replayed += 1
+            while window:
+                _record(*window.popleft())
+    elapsed = time.perf_counter() - start
+    logger.info(
+        f"Replayed {replayed} pages from {config.page_store} in "
+        f"{elapsed:.1f}s ({replayed / max(elapsed, 1e-9):.0f} pages/s).")
+    store.close()
+    return replayed
+
+
+def _record(url, future):
+    if future is not None:
+        analysis, _ = future.result()
+        # the outlinks are not crawled, but the filter still runs
+        scraper.filter_links(scraper.record_page(url, analysis))
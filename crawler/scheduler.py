@@ -0,0 +1,150 @@
+import time
+import heapq
+
+from itertools import count
+from threading import Condition
+from urllib.parse import urlparse
+
+
+def get_host(url):
+    return urlparse(url).hostname or ""
+
+
+class HostScheduler(object):
+    ''' Hands out urls so that every host gets at most one request in flight
+    and at least `delay` seconds between the end of one request and the
+    start of the next. Hosts that have queued urls and are not busy sit in
+    a heap keyed on the time they are next allowed to be hit.
+
+    Without `estimate`, each host's queue is LIFO. With it, urls are handed
+    out best first: a url added with `weight` scores weight * estimate(url),
+    each host's queue is a heap on that score, and of the hosts that are
+    allowed to be hit, the one with the best url goes first. estimate() may
+    change as the crawl learns (crawler/priority.py); the score of a url is
+    read again when it gets to the front of its queue, and it goes back
+    into the queue if it is no longer the best. '''
+
+    def __init__(self, delay, estimate=None):
+        self.delay = delay
+        self.estimate = estimate
+        # host -> heap of (-score, -seq, url, weight), -score is 0 for LIFO
+        self._queues = dict()
+        self._seq = count()
+        self._next_allowed = dict()
+        self._ready = list()
+        # hosts allowed to be hit, as (-score of their best url, the time
+        # they were allowed from, host)
+        self._due = list()
+        self._scheduled = set()
+        self._in_flight = dict()
+        self._busy = set()
+        self._queued = 0
+        self._cond = Condition()
+
+    def __len__(self):
+        with self._cond:
+            return self._queued
+
+    def in_flight(self):
+        ''' Number of urls handed out and not done yet. '''
+        with self._cond:
+            return len(self._in_flight)
+
+    def idle(self):
+        ''' Whether nothing is queued and nothing is in flight, checked
+        atomically. '''
+        with self._cond:
+            return not self._queued and not self._in_flight
+
+    def hosts(self):
+        ''' Number of hosts with queued urls. '''
+        with self._cond:
+            return len(self._queues)
+
+    def _schedule(self, host):
+        if host in self._scheduled or host in self._busy:
+            return
+        if not self._queues.get(host):
+            return
+        self._scheduled.add(host)
+        heapq.heappush(
+            self._ready, (self._next_allowed.get(host, 0), host))
+        self._cond.notify_all()
+
+    def _key(self, url, weight):
+        if self.estimate is None:
+            return 0
+        return -weight * self.estimate(url)
+
+    def add(self, url, weight=1.0):
+        key = self._key(url, weight)
+        with self._cond:
+            host = get_host(url)
+            heapq.heappush(
+                self._queues.setdefault(host, list()),
+                (key, -next(self._seq), url, weight))
+            self._queued += 1
+            self._schedule(host)
+
+    def _pop(self, host):
+        # Caller holds the lock.
+        queue = self._queues[host]
+        while True:
+            key, seq, url, weight = heapq.heappop(queue)
+            if self.estimate is None or not queue:
+                return url
+            key = self._key(url, weight)
+            if key <= queue[0][0]:
+                return url
+            # the estimate went down since it was queued
+            heapq.heappush(queue, (key, seq, url, weight))
+
+    def poll(self):
+        ''' Non-blocking. Returns (url, 0) if a url can be fetched now,
+        (None, seconds) if the next host frees up in that many seconds,
+        (None, inf) if only in-flight urls can produce more work, and
+        (None, None) once there is nothing queued and nothing in flight. '''
+        with self._cond:
+            now = time.monotonic()
+            while self._ready and self._ready[0][0] <= now:
+                allowed, host = heapq.heappop(self._ready)
+                heapq.heappush(
+                    self._due, (self._queues[host][0][0], allowed, host))
+            if not self._due:
+                if self._ready:
+                    return None, self._ready[0][0] - now
+                if self._in_flight:
+                    return None, float("inf")
+                return None, None
+            _, _, host = heapq.heappop(self._due)
+            self._scheduled.discard(host)
+            url = self._pop(host)
+            if not self._queues[host]:
+                del self._queues[host]
+            self._queued -= 1
+            self._in_flight[url] = host
+            self._busy.add(host)
+            return url, 0
+
+    def get(self):
+        ''' Block until a url is allowed to be fetched. Returns None only
+        when the crawl is exhausted. '''
+        with self._cond:
+            while True:
+                url, wait = self.poll()
+                if url is not None or wait is None:
+                    return url
+                self._cond.wait(None if wait == float("inf") else wait)
+
+    def done(self, url):
+        ''' Release the host of a url returned by poll/get, starting its
+        politeness delay. '''
+        with self._cond:
+            host = self._in_flight.pop(url, None)
+            if host is None:
+                return
+            self._busy.discard(host)
+            self._next_allowed[host] = time.monotonic() + self.delay
+            self._schedule(host)
+            # Waiters must also wake up if this was the last url in flight.
+            self._cond.notify_all()
@@ -0,0 +1,194 @@
+import os
+
+import numpy as np
+
+from bisect import bisect_left
+from threading import RLock
+
+# Bytes of the sha256 urlhash that are kept per url. At 10M urls the chance
+# that two different urls share a digest is about 3 in a million.
+DIGEST_BYTES = 8
+# Bits of the bloom filter per url and hash functions, ~1% false positives.
+BITS_PER_URL = 10
+BLOOM_HASHES = 7
+# Checkpoint file header: the store rowid the checkpoint covers (the
+# capacity, for the bloom filter file), then the id of that store.
+HEADER_BYTES = 8
+ID_BYTES = 16
+
+
+def digest(urlhash):
+    ''' The truncated binary digest of a utils.get_urlhash hex digest. '''
+    return int(urlhash[:2 * DIGEST_BYTES], 16)
+
+
+class SeenSet(object):
+    ''' In-memory set of every url hash the frontier has seen, in front of
+    the FrontierStore so the duplicate check of an outlink never touches
+    SQLite.
+
+    A url costs 8 bytes: its truncated digest, in a sorted uint64 array that
+    is binary searched. New digests go to a small python set first and are
+    merged into the array every `merge_every` adds. A bloom filter of
+    BITS_PER_URL bits per url answers most misses without the binary search;
+    its bit positions are derived from the digest, so it can be rebuilt when
+    the set outgrows it.
+
+    checkpoint(rowid) writes the sorted array to `path` and the bloom filter
+    to `path`.bloom, and the next load memory-maps the array; the frontier
+    adds the store rows after `rowid` again on restart, so the store stays
+    the source of truth after a crash. Both files carry the `store_id` of
+    the FrontierStore, and are ignored when loaded for another store: a
+    checkpoint outliving its save file would hide the urls of the new one. '''
+
+    def __init__(self, path=None, capacity=1 << 20, merge_every=1 << 16,
+                 store_id=None):
+        self.path = path
+        self.merge_every = merge_every
+        self._id = bytes.fromhex(store_id) if store_id else bytes(ID_BYTES)
+        self._lock = RLock()
+        self._tail = set()
+        self._set_sorted(np.zeros(0, dtype=np.uint64))
+        self.rowid = 0
+        if path and os.path.exists(path):
+            self._load()
+        if not self._load_bloom():
+            self._build_bloom(max(capacity, 2 * len(self)))
+
+    def _set_sorted(self, digests):
+        self._sorted = digests
+        # bisect on a memoryview of the array is faster than a searchsorted
+        # call for a single value
+        self._view = memoryview(digests.view(np.uint8)).cast('Q')
+
+    def _bloom_file(self):
+        return f"{self.path}.bloom"
+
+    def _load(self):
+        size = (os.path.getsize(self.path) - HEADER_BYTES - ID_BYTES) // 8
+        if size < 0:
+            return
+        with open(self.path, "rb") as checkpoint:
+            rowid = int.from_bytes(checkpoint.read(HEADER_BYTES), "little")
+            if checkpoint.read(ID_BYTES) != self._id:
+                return
+        self.rowid = rowid
+        if size:
+            self._set_sorted(np.memmap(
+                self.path, dtype='<u8', mode='r',
+                offset=HEADER_BYTES + ID_BYTES, shape=(size,)))
+
+    def _load_bloom(self):
+        ''' The bloom filter of the last checkpoint, if it is complete. '''
+        if not self.path or not os.path.exists(self._bloom_file()):
+            return False
+        with open(self._bloom_file(), "rb") as bloom_file:
+            capacity = int.from_bytes(bloom_file.read(HEADER_BYTES), "little")
+            store_id = bloom_file.read(ID_BYTES)
+            bloom = bloom_file.read()
+        bits = capacity * BITS_PER_URL
+        if (store_id != self._id or len(bloom) != (bits + 7) // 8
+                or capacity < len(self)):
+            return False
+        self._capacity = capacity
+        self._bits = bits
+        self._bloom = bytearray(bloom)
+        return True
+
+    def _build_bloom(self, capacity):
+        self._capacity = capacity
+        self._bits = capacity * BITS_PER_URL
+        bloom = np.zeros((self._bits + 7) // 8, dtype=np.uint8)
+        digests = self._sorted
+        if self._tail:
+            digests = np.concatenate(
+                [digests, np.fromiter(self._tail, dtype=np.uint64)])
+        # (h1 + i * h2) mod bits for i < BLOOM_HASHES, in chunks to bound the
+        # scratch space
+        for start in range(0, len(digests), 1 << 20):
+            chunk = np.asarray(digests[start:start + (1 << 20)], dtype=np.uint64)
+            h1 = chunk & np.uint64(0xFFFFFFFF)
+            h2 = (chunk >> np.uint64(32)) | np.uint64(1)
+            for i in range(BLOOM_HASHES):
+                positions = (h1 + np.uint64(i) * h2) % np.uint64(self._bits)
+                np.bitwise_or.at(
+                    bloom, positions >> np.uint64(3),
+                    (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self._bloom = bytearray(bloom.tobytes())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._sorted) + len(self._tail)
+
+    def __contains__(self, urlhash):
+        value = digest(urlhash)
+        h1 = value & 0xFFFFFFFF
+        h2 = (value >> 32) | 1
+        with self._lock:
+            bloom = self._bloom
+            bits = self._bits
+            for i in range(BLOOM_HASHES):
+                position = (h1 + i * h2) % bits
+                if not bloom[position >> 3] & (1 << (position & 7)):
+                    return False
+            if value in self._tail:
+                return True
+            view = self._view
+            index = bisect_left(view, value)
+            return index < len(view) and view[index] == value
+
+    def add(self, urlhash):
+        self.add_digest(digest(urlhash))
+
+    def add_digest(self, value):
+        h1 = value & 0xFFFFFFFF
+        h2 = (value >> 32) | 1
+        with self._lock:
+            bloom = self._bloom
+            bits = self._bits
+            for i in range(BLOOM_HASHES):
+                position = (h1 + i * h2) % bits
+                bloom[position >> 3] |= 1 << (position & 7)
+            self._tail.add(value)
+            if len(self._tail) >= self.merge_every:
+                self._merge()
+            if len(self) > self._capacity:
+                self._build_bloom(2 * self._capacity)
+
+    def _merge(self):
+        if not self._tail:
+            return
+        tail = np.fromiter(self._tail, dtype=np.uint64, count=len(self._tail))
+        tail.sort()
+        # both runs are sorted: the positions of the tail in the array are
+        # found by binary search and it is inserted in one linear pass
+        self._set_sorted(np.insert(
+            self._sorted, np.searchsorted(self._sorted, tail), tail))
+        self._tail = set()
+
+    def checkpoint(self, rowid):
+        ''' Write the digests, as covering the store up to `rowid`. '''
+        with self._lock:
+            if not self.path:
+                return
+            self._merge()
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, "wb") as checkpoint:
+                checkpoint.write(int(rowid).to_bytes(HEADER_BYTES, "little"))
+                checkpoint.write(self._id)
+                self._sorted.astype('<u8').tofile(checkpoint)
+            with open(f"{self._bloom_file()}.tmp", "wb") as bloom_file:
+                bloom_file.write(self._capacity.to_bytes(HEADER_BYTES, "little"))
+                bloom_file.write(self._id)
+                bloom_file.write(self._bloom)
+            # A bloom filter that is newer than the digests is still correct,
+            # so it is replaced first.
+            os.replace(f"{self._bloom_file()}.tmp", self._bloom_file())
+            os.replace(tmp_file, self.path)
+            self.rowid = rowid
+
+    @staticmethod
+    def remove(path):
+        for name in (path, f"{path}.bloom"):
+            if os.path.exists(name):
+                os.remove(name)
@@ -0,0 +1,264 @@
+import os
+import time
+import atexit
+import sqlite3
+
+from threading import Thread, RLock, Event
+from uuid import uuid4
+
+
+class FrontierStore(object):
+    ''' Thread-safe persistent map of urlhash -> (url, completed), backed by
+    SQLite in WAL mode. Writes are grouped into one transaction which is
+    committed every `commit_batch` writes or every `commit_interval` seconds,
+    whichever comes first, so a crash loses at most that window. Writes are
+    committed in the order they were made, so a committed completion always
+    implies its outlinks were committed too. `before_commit` is called
+    before every commit, to make what a completion depends on durable first.
+
+    Urls that are not completed are also kept in a `pending` table keyed by
+    their rowid in `urls`, with their link depth and the rank the frontier
+    gave them (lowest first, see crawler/priority.py). Resuming a crawl reads only the work
+    queue, best first and a chunk at a time, through an index on the rank,
+    instead of scanning every url.
+
+    The store also keeps the query variants seen per path on trap hosts,
+    see crawler/traps.py, and the download yield counts of
+    crawler/priority.py.
+
+    Every store gets a random `store_id` when it is created, so files kept
+    next to it (the seen url checkpoint, see crawler/seen.py) can tell
+    whether they belong to it or to a deleted store of the same name. '''
+
+    def __init__(self, path, commit_interval=1.0, commit_batch=1000,
+                 before_commit=None):
+        self.path = path
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self.before_commit = before_commit
+        self._lock = RLock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS urls ("
+            "hash TEXT PRIMARY KEY, url TEXT NOT NULL, "
+            "completed INTEGER NOT NULL)")
+        has_pending = self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' "
+            "AND name = 'pending'").fetchone() is not None
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            "id INTEGER PRIMARY KEY, url TEXT NOT NULL, "
+            "rank REAL NOT NULL DEFAULT 0, depth INTEGER NOT NULL DEFAULT 0)")
+        if not has_pending:
+            # save file of an older version
+            self._conn.execute(
+                "INSERT INTO pending (id, url) "
+                "SELECT rowid, url FROM urls WHERE completed = 0")
+        columns = [
+            row[1] for row in self._conn.execute("PRAGMA table_info(pending)")]
+        if "rank" not in columns:
+            # pending table of a version without ranks, resumed in id order
+            self._conn.execute(
+                "ALTER TABLE pending ADD COLUMN rank REAL NOT NULL DEFAULT 0")
+            self._conn.execute(
+                "ALTER TABLE pending ADD COLUMN depth INTEGER NOT NULL DEFAULT 0")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS pending_rank ON pending (rank, id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS traps ("
+            "path TEXT NOT NULL, variant TEXT NOT NULL, "
+            "PRIMARY KEY (path, variant))")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS yields ("
+            "key TEXT PRIMARY KEY, downloads INTEGER NOT NULL, "
+            "kept INTEGER NOT NULL)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self._conn.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('store_id', ?)",
+            (uuid4().hex,))
+        self.store_id = self._conn.execute(
+            "SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+        self._closed = Event()
+        self._flusher = Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def remove(path):
+        ''' Delete a store and its WAL side files. '''
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+    def _execute(self, query, args):
+        # Caller holds the lock.
+        if not self._conn.in_transaction:
+            self._conn.execute("BEGIN")
+        self._dirty += 1
+        return self._conn.execute(query, args)
+
+    def _maybe_commit(self):
+        # Caller holds the lock.
+        if (self._dirty >= self.commit_batch or
+                time.monotonic() - self._last_commit >= self.commit_interval):
+            self.commit()
+
+    def _write(self, query, args):
+        cursor = self._execute(query, args)
+        self._maybe_commit()
+        return cursor
+
+    def _flush_loop(self):
+        while not self._closed.wait(self.commit_interval):
+            with self._lock:
+                if self._dirty and not self._closed.is_set():
+                    self.commit()
+
+    def commit(self):
+        with self._lock:
+            if self._conn.in_transaction:
+                if self.before_commit is not None:
+                    self.before_commit()
+                self._conn.execute("COMMIT")
+            self._dirty = 0
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._closed.is_set():
+                return
+            self.commit()
+            self._closed.set()
+            self._conn.close()
+
+    def __contains__(self, urlhash):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM urls WHERE hash = ?", (urlhash,)
+            ).fetchone() is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM urls").fetchone()[0]
+
+    def __bool__(self):
+        # without counting every url
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM urls LIMIT 1").fetchone() is not None
+
+    def add(self, urlhash, url, rank=0.0, depth=0):
+        ''' Insert a new, not completed url, resumed after the pending urls
+        of lower rank. Returns False if the urlhash was already present. '''
+        with self._lock:
+            cursor = self._execute(
+                "INSERT OR IGNORE INTO urls (hash, url, completed) "
+                "VALUES (?, ?, 0)", (urlhash, url))
+            added = cursor.rowcount == 1
+            if added:
+                # same transaction, a committed url is always pending or done
+                self._execute(
+                    "INSERT INTO pending (id, url, rank, depth) "
+                    "VALUES (?, ?, ?, ?)",
+                    (cursor.lastrowid, url, rank, depth))
+            self._maybe_commit()
+            return added
+
+    def mark_complete(self, urlhash, url):
+        ''' Returns False if the url had not been added before. '''
+        with self._lock:
+            updated = self._execute(
+                "UPDATE urls SET completed = 1 WHERE hash = ?",
+                (urlhash,)).rowcount == 1
+            if updated:
+                self._execute(
+                    "DELETE FROM pending WHERE id = "
+                    "(SELECT rowid FROM urls WHERE hash = ?)", (urlhash,))
+            else:
+                self._execute(
+                    "INSERT INTO urls (hash, url, completed) VALUES (?, ?, 1)",
+                    (urlhash, url))
+            self._maybe_commit()
+            return updated
+
+    def last_pending_id(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(MAX(id), 0) FROM pending").fetchone()[0]
+
+    def pending(self, after=None, end=None, limit=10000):
+        ''' Up to `limit` (rank, id, url, depth) of the pending urls with
+        ids up to `end`, by rank and then in the order they were added,
+        starting after the (rank, id) position `after`. '''
+        rank, after_id = after if after is not None else (float("-inf"), 0)
+        if end is None:
+            end = self.last_pending_id()
+        with self._lock:
+            return self._conn.execute(
+                "SELECT rank, id, url, depth FROM pending "
+                "WHERE id <= ? AND (rank, id) > (?, ?) "
+                "ORDER BY rank, id LIMIT ?",
+                (end, rank, after_id, limit)).fetchall()
+
+    def committed_rowid(self):
+        ''' Commit, and return the rowid of the last url added so far. '''
+        with self._lock:
+            self.commit()
+            return self._conn.execute(
+                "SELECT COALESCE(MAX(rowid), 0) FROM urls").fetchone()[0]
+
+    def hashes(self, after=0):
+        ''' The urlhash of every url added after rowid `after`, in chunks so
+        the whole table is never in memory at once. '''
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, hash FROM urls WHERE rowid > ? "
+                    "ORDER BY rowid LIMIT 100000", (after,)).fetchall()
+            if not rows:
+                return
+            for after, urlhash in rows:
+                yield urlhash
+
+    def values(self):
+        ''' All (url, completed) pairs. '''
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url, completed FROM urls").fetchall()
+        return [(url, bool(completed)) for url, completed in rows]
+
+    def trap_variants(self, path):
+        with self._lock:
+            return [variant for variant, in self._conn.execute(
+                "SELECT variant FROM traps WHERE path = ?", (path,))]
+
+    def add_trap_variant(self, path, variant):
+        with self._lock:
+            self._write(
+                "INSERT OR IGNORE INTO traps (path, variant) VALUES (?, ?)",
+                (path, variant))
+
+    def yields(self):
+        ''' All (key, downloads, kept) yield counts. '''
+        with self._lock:
+            return self._conn.execute(
+                "SELECT key, downloads, kept FROM yields").fetchall()
+
+    def add_yields(self, keys, kept):
+        ''' Count one download, kept or not, for each of `keys`. '''
+        with self._lock:
+            for key in keys:
+                self._execute(
+                    "INSERT INTO yields (key, downloads, kept) VALUES (?, 1, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET "
+                    "downloads = downloads + 1, kept = kept + excluded.kept",
+                    (key, int(kept)))
+            self._maybe_commit()
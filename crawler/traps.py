@@ -0,0 +1,59 @@
+from collections import OrderedDict
+from threading import RLock
+from urllib.parse import urlparse
+
+from utils.url_filter import is_trap_host, MAX_SUBDOMAIN_THRESHOLD
+
+
+class TrapDetector(object):
+    ''' Admits at most MAX_SUBDOMAIN_THRESHOLD + 1 distinct query variants of
+    the same path on trap hosts (wikis, elms, gitlab). Only new urls should
+    be passed to admit(), so duplicate outlinks and restarts do not count.
+
+    Every path keeps at most threshold + 1 variants, which is exact and
+    bounded, and only the `max_paths` most recently used paths are held in
+    memory. The variants are written through to the frontier store, so
+    evicted paths are reloaded from there and restarts keep their counts. '''
+
+    def __init__(self, store, max_paths=100000,
+                 threshold=MAX_SUBDOMAIN_THRESHOLD):
+        self.store = store
+        self.max_paths = max_paths
+        self.threshold = threshold
+        self._paths = OrderedDict()
+        self._lock = RLock()
+
+    def _variants(self, path):
+        variants = self._paths.get(path)
+        if variants is None:
+            variants = set(self.store.trap_variants(path))
+            self._paths[path] = variants
+            if len(self._paths) > self.max_paths:
+                self._paths.popitem(last=False)
+        else:
+            self._paths.move_to_end(path)
+        return variants
+
+    def variants(self, path):
+        ''' Number of query variants of `path` (a url without its query)
+        admitted so far. '''
+        with self._lock:
+            return len(self._variants(path))
+
+    def admit(self, url):
+        ''' Record url as a variant of its path. Returns False if the path
+        already has too many other variants. '''
+        hostname = urlparse(url).hostname
+        if not hostname or not is_trap_host(hostname):
+            return True
+        # url without the query
+        path, _, query = url.partition('?')
+        with self._lock:
+            variants = self._variants(path)
+            if query in variants:
+                return True
+            if len(variants) > self.threshold:
+                return False
+            variants.add(query)
+            self.store.add_trap_variant(path, query)
+            return True
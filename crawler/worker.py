@@ -4,7 +4,6 @@ from inspect import getsource
 from utils.download import download
 from utils import get_logger
 import scraper
-import time
 
 
 class Worker(Thread):
@@ -23,12 +22,20 @@ class Worker(Thread):
             if not tbd_url:
                 self.logger.info("Frontier is empty. Stopping Crawler.")
                 break
-            resp = download(tbd_url, self.config, self.logger)
-            self.logger.info(
-                f"Downloaded {tbd_url}, status <{resp.status}>, "
-                f"using cache {self.config.cache_server}.")
-            scraped_urls = scraper.scraper(tbd_url, resp)
-            for scraped_url in scraped_urls:
-                self.frontier.add_url(scraped_url)
-            self.frontier.mark_url_complete(tbd_url)
-            time.sleep(self.config.time_delay)
+            useful = False
+            try:
+                resp = download(tbd_url, self.config, self.logger)
+                self.logger.info(
+                    f"Downloaded {tbd_url}, status <{resp.status}>, "
+                    f"using cache {self.config.cache_server}.")
+                # whether the page was kept teaches the frontier which urls
+                # are worth downloading first
+                scraped_urls, useful = scraper.scrape(tbd_url, resp)
+                for scraped_url in scraped_urls:
+                    self.frontier.add_url(scraped_url, tbd_url)
+            except Exception:
+                # The host has to be released either way, otherwise the
+                # other workers wait on it forever.
+                self.logger.exception(f"Failed to process {tbd_url}.")
+            # Politeness is enforced per host by the frontier from here on.
+            self.frontier.mark_url_complete(tbd_url, useful)
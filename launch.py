@@ -3,23 +3,89 @@ from argparse import ArgumentParser
 
 from utils.server_registration import get_cache_server
 from utils.config import Config
+from utils.page_store import PageStore
 from crawler import Crawler
+from crawler.frontier import Frontier
+from crawler.cluster import PartitionedFrontier, DataframeServer
+from crawler.replay import replay
 import scraper
 
 
-def main(config_file, restart):
+def main(config_file, restart, engine=None, node_index=None):
     cparser = ConfigParser()
     cparser.read(config_file)
     config = Config(cparser)
+    if engine:
+        config.engine = engine
+    if node_index is not None:
+        config.node_index = node_index
     config.cache_server = get_cache_server(config, restart)
-    crawler = Crawler(config, restart)
+    # With NODES > 1 this process crawls its share of the hosts.
+    crawler = Crawler(
+        config, restart, frontier_factory=(
+            PartitionedFrontier if config.nodes > 1 else Frontier))
+    if crawler.frontier.from_seed:
+        # Report statistics, fingerprints and pages belong to the crawl that
+        # was discarded, by --restart or by deleting the save file.
+        scraper.report_stats.reset()
+        scraper.near_duplicates.reset()
+        if config.page_store:
+            PageStore.remove(config.page_store)
     crawler.start()
+    # pages still in the workers' report shards
+    scraper.report_stats.flush()
+    # Lets the next run memory-map the fingerprint index and the seen urls
+    # instead of sorting them.
+    scraper.near_duplicates.checkpoint()
+    crawler.frontier.checkpoint()
+    if config.nodes > 1:
+        # Node 0 reports on the whole crawl, the others on their hosts.
+        return crawler.frontier.cluster.merge_reports(
+            scraper.report_stats, scraper.cluster_report)
+    return scraper.report_stats
+
+
+def main_replay(config_file, processes=None):
+    # Rebuild the report from the stored pages of the last crawl, no cache
+    # server needed.
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    config = Config(cparser)
+    assert config.page_store, "Set PAGESTORE in config.ini to replay a crawl"
+    scraper.report_stats.reset()
+    scraper.near_duplicates.reset()
+    replay(config, config.parse_processes if processes is None else processes)
+    scraper.report_stats.flush()
+    scraper.near_duplicates.checkpoint()
+    return scraper.report_stats
+
+
+def main_dataframe_server(config_file):
+    # The dataframe the nodes of a partitioned crawl share, until killed.
+    cparser = ConfigParser()
+    cparser.read(config_file)
+    config = Config(cparser)
+    server = DataframeServer(config.dataframe_port).start()
+    print(f"Serving the crawl dataframe on port {server.address[1]}.")
+    server.join()
 
 
 if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--restart", action="store_true", default=False)
     parser.add_argument("--config_file", type=str, default="config.ini")
+    parser.add_argument("--engine", type=str, choices=["threads", "async", "pipeline"], default=None)
+    parser.add_argument("--replay", action="store_true", default=False)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--node-index", type=int, default=None)
+    parser.add_argument("--dataframe-server", action="store_true", default=False)
     args = parser.parse_args()
-    main(args.config_file, args.restart)
-    scraper.generate_report()
+    if args.dataframe_server:
+        main_dataframe_server(args.config_file)
+    else:
+        if args.replay:
+            report = main_replay(args.config_file, args.processes)
+        else:
+            report = main(
+                args.config_file, args.restart, args.engine, args.node_index)
+        scraper.generate_report(report)
@@ -1,32 +1,56 @@
 import re
 from urllib.parse import urlparse, urljoin
-from bs4 import BeautifulSoup
-from simhash import Simhash, SimhashIndex
-import json
+from collections import Counter
+from utils.report import ReportStore
+from utils.parse import parse_page
+from utils.url_filter import check_url, filter_urls
+from utils.canonical import canonicalize
+from utils.dedup import fingerprint, NearDuplicateIndex
+from utils.stats import stats
 
 CHAR_THRESHOLD = 300
-MAX_SUBDOMAIN_THRESHOLD = 5
+# Content-Types that are parsed; text/plain pages (word lists, READMEs) count
+# towards the report like html ones
+PARSED_TYPES = {'text/html', 'application/xhtml+xml', 'text/plain'}
 STOP_WORDS = {'a', 'about', 'above', 'after', 'again', 'against', 'all', 'am', 'an', 'and', 'any', 'are', "aren't", 'as', 'at', 'be', 'because', 'been', 'before', 'being', 'below', 'between', 'both', 'but', 'by', "can't", 'cannot', 'could', "couldn't", 'did', "didn't", 'do', 'does', "doesn't", 'doing', "don't", 'down', 'during', 'each', 'few', 'for', 'from', 'further', 'had', "hadn't", 'has', "hasn't", 'have', "haven't", 'having', 'he', "he'd", "he'll", "he's", 'her', 'here', "here's", 'hers', 'herself', 'him', 'himself', 'his', 'how', "how's", 'i', "i'd", "i'll", "i'm", "i've", 'if', 'in', 'into', 'is', "isn't", 'it', "it's", 'its', 'itself', "let's", 'me', 'more', 'most', "mustn't", 'my', 'myself', 'no', 'nor', 'not', 'of', 'off', 'on', 'once', 'only', 'or', 'other', 'ought', 'our', 'ours', 'ourselves', 'out', 'over', 'own', 'same', "shan't", 'she', "she'd", "she'll", "she's", 'should', "shouldn't", 'so', 'some', 'such', 'than', 'that', "that's", 'the', 'their', 'theirs', 'them', 'themselves', 'then', 'there', "there's", 'these', 'they', "they'd", "they'll", "they're", "they've", 'this', 'those', 'through', 'to', 'too', 'under', 'until', 'up', 'very', 'was', "wasn't", 'we', "we'd", "we'll", "we're", "we've", 'were', "weren't", 'what', "what's", 'when', "when's", 'where', "where's", 'which', 'while', 'who', "who's", 'whom', 'why', "why's", 'with', "won't", 'would', "wouldn't", 'you', "you'd", "you'll", "you're", "you've", 'your', 'yours', 'yourself', 'yourselves'}
-# contains a dictionary of counts of urls with same path but different queries (for trap detection)
-trap_subdomain_urls = dict()
-# simhash dictionaries
-simhash_dict = dict()
-simhash_indicies = SimhashIndex([(str(k), Simhash(get_features(v))) for k, v in simhash_dict.items()], k=3)
-
-# report 1
-unique_links = set()
-# report 2
-max_word_link = ''
-max_words = -1
-# report 3 
-# contains a dictionary that stores the 50 most common words
-frequency_dict = dict()
-# report 4
-domainList = {}
+# simhash fingerprints of every page kept so far, persisted to simhash_index
+# so a resumed crawl still recognizes (near) duplicates
+SIMHASH_FILE = "simhash_index"
+near_duplicates = NearDuplicateIndex(SIMHASH_FILE, k=3)
+
+# report statistics (unique pages, longest page, word frequencies, subdomains),
+# kept in memory and persisted to report_data.json + report_data.log
+REPORT_FILE = "report_data"
+report_stats = ReportStore(REPORT_FILE)
+# on node 0 of a partitioned crawl, the merged report of all nodes
+CLUSTER_REPORT_FILE = "cluster_report_data"
+cluster_report = ReportStore(CLUSTER_REPORT_FILE)
 
 def scraper(url, resp):
     links = extract_next_links(url, resp)
-    return [link for link in links if is_valid(link)]
+    return filter_links(links)
+
+def scrape(url, resp):
+    # scraper() for the crawler's workers: the links, and whether the page was
+    # kept, which the frontier learns from where the useful pages are
+    content = page_content(resp)
+    if content is None:
+        return list(), False
+    with stats.timer("parse"):
+        analysis = analyze_page(url, content)
+    kept = keep_page(url, analysis)
+    return filter_links(analysis['links'] if kept else list()), kept
+
+def filter_links(links):
+    # trap hosts (wikis, gitlab, ...) are limited per path by the frontier
+    if not stats.enabled:
+        return filter_urls(links)
+    reasons = dict()
+    with stats.timer("filter"):
+        valid = filter_urls(links, reasons)
+    for reason, count in reasons.items():
+        stats.incr(f"rejected.{reason}", count)
+    return valid
 
 def extract_next_links(url, resp):
     # Implementation required.
@@ -39,194 +63,145 @@ def extract_next_links(url, resp):
     #         resp.raw_response.content: the content of the page!
     # Return a list with the hyperlinks (as strings) scrapped from resp.raw_response.content
 
+    content = page_content(resp)
+    if content is None:
+        return list()
+    with stats.timer("parse"):
+        analysis = analyze_page(url, content)
+    return record_page(url, analysis)
+
+def page_content(resp):
     # check that the return code is valid 
     if resp == None or resp.status != 200 or resp.raw_response == None:
-        return list()
-    soup = BeautifulSoup(resp.raw_response.content, 'lxml') # convert the content of the website to BeautifulSoup
+        return None
+    # only text is parsed, the header is checked before the body is touched
+    if not is_parsed(resp.content_type):
+        stats.incr("skipped_content_type")
+        return None
+    # resp.content is cut to the PARSESIZE limit of config.ini (none by
+    # default), the words past it are not counted in the report
+    if resp.truncated:
+        stats.incr("truncated_pages")
+    return resp.content
+
+def is_parsed(content_type):
+    # pages without a content type are given the benefit of the doubt
+    mime = content_type.split(';')[0].strip().lower()
+    return mime in PARSED_TYPES or mime == ''
+
+def analyze_page(url, content):
+    # The CPU heavy half of extract_next_links. It only depends on its
+    # arguments, so it can run in another process (see crawler/async_worker.py
+    # and crawler/pipeline.py).
+    # Returns None if the page is too short to be considered.
+
+    # one streaming pass over the page gives the text, the words and the hrefs
+    # (same text as BeautifulSoup's get_text(), without building a tree)
+    page = parse_page(content)
 
     # check that the website contains enough characters to be considered
-    if len(soup.get_text()) <= CHAR_THRESHOLD:
-        return list()
-
-    #####################################  Simhash similarity
-    sh_obj = Simhash(get_features(soup.get_text()))
-    if sh_obj.value in simhash_dict: # check for exact duplicates
-        return list()
-    elif len(simhash_indicies.get_near_dups(sh_obj)) != 0: # check for near duplicates via simhash
-        return list()
-    else: # store simhash object data and indicies for future comparisons
-        simhash_dict[sh_obj.value] = sh_obj
-        simhash_indicies.add(sh_obj.value, sh_obj)
-    
-    # get global variables
-    global frequency_dict, unique_links, max_word_link, max_words, domainList
-    ##################################### Json File Read
-    with open("report_data.json", "r") as readfile:
-        data = json.loads(readfile.read())
-        frequency_dict = data['frequency_dict']
-        unique_links = set(data['unique_links'])
-        max_word_link = data['max_word_link']
-        max_words = data['max_words']
-        domainList = data['domainList']
-
-    ##################################### Report #1
-    unique_links.add(url) # keep track of the valid links in a set
+    if page.char_count <= CHAR_THRESHOLD:
+        return None
 
     ##################################### Longest page for report #2
-    words = [word.lower() for word in re.findall(r"[a-zA-Z][a-zA-Z0-9]+'?[a-zA-Z0-9]*", soup.get_text())]
+    words = page.words
     num_words = len(words)
-    if max_words < num_words:
-        max_words = num_words
-        max_word_link = url
     
     ##################################### Most frequent words for report #3
-    for tok in words:
-        if tok not in STOP_WORDS:
-            if tok not in frequency_dict:
-                frequency_dict[tok] = 1
-            else:
-                frequency_dict[tok] += 1
+    frequencies = Counter(tok for tok in words if tok not in STOP_WORDS)
+
+    ##################################### Main url retrieval
+    urls = []
+    for href in page.hrefs: # retrieve all urls from the page
+        link = urljoin(url, href) # convert relative url to absolute
+        if link != None:
+            # defragmented and canonical (see utils/canonical.py), so aliases
+            # of one page are fetched once
+            urls.append(canonicalize(link))
+        #print(urls[-1])
+    # a page often links to the same url more than once
+    urls = list(dict.fromkeys(urls))
+
+    return {
+        'fingerprint': fingerprint(page.text),
+        'num_words': num_words,
+        'frequencies': frequencies,
+        'links': urls
+    }
+
+def record_page(url, analysis):
+    # The stateful half of extract_next_links: duplicate detection and the
+    # report. Returns the links of the page, or none if it is not kept.
+    return analysis['links'] if keep_page(url, analysis) else list()
+
+def keep_page(url, analysis):
+    # Duplicate detection and the report. Returns whether the page was kept:
+    # long enough (analysis is None otherwise) and not a near duplicate.
+    if analysis is None:
+        return False
+
+    #####################################  Simhash similarity
+    # check for exact and near duplicates (within 3 bits), otherwise store the
+    # fingerprint for future comparisons. The page's own fingerprint from
+    # before a crash does not count, so a url fetched again keeps its links.
+    with stats.timer("dedup"):
+        duplicate = near_duplicates.check_and_add(analysis['fingerprint'], url)
+    if duplicate:
+        stats.incr("near_duplicates")
+        return False
     
     ##################################### Calculating total amount of subdomains - #4
     icsCheck = r'^.+\.ics\.uci\.edu.*$' #See if the url contains ics.uci.edu
     subDomain = urlparse(url) 
     
+    ics_subdomain = None
     if re.match(icsCheck, subDomain.hostname): 
         if subDomain.hostname != 'www.ics.uci.edu': #check to see if it's the original domain
-            if subDomain.hostname in domainList: 
-                domainList[subDomain.hostname] += 1 #if already in dictionary increment the count
-            else:
-                domainList[subDomain.hostname] = 1  #if not add the key to the dictionary with count of 1 as value
-    
+            ics_subdomain = subDomain.hostname
 
-    ##################################### Main url retrieval
-    urls = []
-    for link in soup.find_all('a'): # retrieve all urls from the soup
-        link = urljoin(url, link.get('href')) # convert relative url to absolute
-        if link != None:
-            urls.append(link.split('#')[0]) # defragment the url before appending it to the frontier
-        #print(urls[-1])
+    ##################################### Report #1 - #4
+    # fold this page into the report, only the page's delta is written to disk
+    report_stats.record_page(
+        url, analysis['num_words'], analysis['frequencies'], ics_subdomain)
     
-    ##################################### Json File Dump
-    out_dict = {
-        'frequency_dict': frequency_dict,
-        'unique_links' : list(unique_links),
-        'max_word_link' : max_word_link,
-        'max_words' : max_words,
-        'domainList' : domainList
-    }
-    with open("report_data.json", "w") as outfile:
-        json.dump(out_dict, outfile)
-
-    return urls
+    return True
 
 def is_valid(url):
     # Decide whether to crawl this url or not. 
     # If you decide to crawl it, return True; otherwise return False.
-    # There are already some conditions that return False.
+    # The rules are compiled once in utils/url_filter.py, check_url also
+    # tells why a url was rejected. This has no side effects, so urls can be
+    # re-validated freely.
     try:
-        parsed = urlparse(url)
-
-        if parsed is None or parsed.hostname is None:
-            return False
-
-        if parsed.scheme not in set(["http", "https"]):
-            return False
-
-        # check that we have a valid domain specified by the assignment constraints
-        valid_suffix_list = [r'^.+\.ics\.uci\.edu.*$', r'^.+\.cs\.uci\.edu.*$'\
-                            , r'^.+\.informatics\.uci\.edu.*$', r'^.+\.stat\.uci\.edu.*$']
-        if all([re.match(domain, parsed.hostname)==None for domain in valid_suffix_list]):
-            return False
-
-        # common trap patterns
-        trap_detection_patterns = [
-                                    r'.*/appointment.*', # for appointment trap detection
-                                    r'.*/calendar.*'     # for calendar trap detection
-                                    ]
-
-        if any(re.match(pattern, parsed.path.lower()) != None for pattern in trap_detection_patterns):
-            return False
-
-        # avoid repeated patterns
-        if re.match(r'^.*?(/.+?/).*?\1.*$', parsed.path.lower()) != None:
-            return False
-
-        ##################################### website trap detection (swiki, wiki, gitlab, etc.)
-        # Only get a threshold number of urls with the same path (but different queries)
-        trap_patterns = [r'.*swiki.*', r'.*wiki.*', r'.*elms.*', r'.*gitlab.*']
-        if any(re.match(pattern, parsed.hostname.lower()) != None for pattern in trap_patterns):
-            # url without the query
-            no_q = url.split('?')[0]
-            if trap_subdomain_urls.get(no_q, 0) > MAX_SUBDOMAIN_THRESHOLD:
-                return False
-            else:
-                trap_subdomain_urls[no_q] = trap_subdomain_urls.get(no_q, 0) + 1
-
-        ##################################### gitlab specific traps
-        if re.match(r'.*gitlab.*', parsed.hostname.lower()) != None:
-            gitlab_filters =   [r'.*/commits/.*', 
-                                r'.*/commit/.*', 
-                                r'.*/graphs/.*', 
-                                r'.*/network/.*', 
-                                r'.*/tree/.*',
-                                r'.*/raw/.*',
-                                r'.*/find_file/.*',
-                                r'.*/blame/.*',
-                                r'.*/tags(/.*)?$',
-                                r'.*/incidents(/.*)?$']
-            if any(re.match(pattern, parsed.path.lower()) != None for pattern in gitlab_filters):
-                return False
-
-        # filter certain datasets in the ml archive
-        if re.match(r'.*datasets.php.*', parsed.path.lower()) != None and re.match(f'.*format=.*', parsed.query) != None:
-            return False
-        
-        return not re.match(
-            r".*\.(css|js|bmp|gif|jpe?g|ico"
-            + r"|png|tiff?|mid|mp2|mp3|mp4"
-            + r"|wav|avi|mov|mpeg|ram|m4v|mkv|ogg|ogv|pdf"
-            + r"|ps|eps|tex|ppt|pptx|doc|docx|xls|xlsx|names"
-            + r"|data|dat|exe|bz2|tar|msi|bin|7z|psd|dmg|iso"
-            + r"|epub|dll|cnf|tgz|sha1"
-            + r"|thmx|mso|arff|rtf|jar|csv"
-            + r"|mpe?g|ppsx|img|war|py|java|c|asm|atom|apk|rs|ds_store|git" # additional extensions to filter
-            + r"|rm|smil|wmv|swf|wma|zip|rar|gz)$", parsed.path.lower())
-
+        return check_url(url) is None
     except TypeError:
-        print ("TypeError for ", parsed)
+        print ("TypeError for ", url)
         raise
 
-# Reference: https://leons.im/posts/a-python-implementation-of-simhash-algorithm/
-def get_features(s):
-    width = 3
-    s = s.lower()
-    s = re.sub(r'[^\w]+', '', s)
-    return [s[i:i + width] for i in range(max(len(s) - width + 1, 1))]
-
-def generate_report():
+def generate_report(store=None):
     # generate the report with all questions from canvas and their corresponding answers
+    # from report_stats, or another ReportStore such as cluster_report
+    if store is None:
+        store = report_stats
     report = open('report.txt', 'w')
 
     questions = []
 
-    # get global variables
-    global frequency_dict, unique_links, max_word_link, max_words, domainList
+    # make sure everything recorded so far is in the snapshot
+    store.compact()
 
     # Question 1
-    questions.append(f'1. How many unique pages did you find? \nThere are {len(unique_links)} unique links.\n\n')
+    questions.append(f'1. How many unique pages did you find? \nThere are {len(store.unique_links)} unique links.\n\n')
     # Question 2
-    questions.append(f'2. What is the longest page in terms of the number of words? \nThe longest page in terms of the number of words is {max_word_link} with {max_words} words.\n\n')
+    questions.append(f'2. What is the longest page in terms of the number of words? \nThe longest page in terms of the number of words is {store.max_word_link} with {store.max_words} words.\n\n')
     # Question 3
-    # global frequency_dict
-    sorted_freq = sorted(frequency_dict.items(), key=lambda x: (-x[1], x[0]))
     word_str = ''
-    for i, (word, frequency) in enumerate(sorted_freq[:50]):
+    for i, (word, frequency) in enumerate(store.top_words(50)):
         word_str += f'Word {(i+1)}: {word}, Frequency: {frequency}\n'
     questions.append(f'3. What are the 50 most common words in the entire set of pages crawled under these domains? \nThe 50 most common words are listed as follows:\n{word_str}\n')
     # Question 4
-    subdomain_str = f'4. How many subdomains did you find in the ics.uci.edu domain? \n{len(domainList.keys())} total subdomains in ics.uci.edu \n'
-    for key, value in sorted(domainList.items(), key=lambda x: x[0].lower()):
+    subdomain_str = f'4. How many subdomains did you find in the ics.uci.edu domain? \n{len(store.domainList.keys())} total subdomains in ics.uci.edu \n'
+    for key, value in sorted(store.domainList.items(), key=lambda x: x[0].lower()):
         subdomain_str += f'{key}, {value}\n'
     questions.append(subdomain_str)
 
@@ -1,24 +1,48 @@
 import os
+import queue
+import atexit
 import logging
+import logging.handlers
 from hashlib import sha256
+from threading import Lock
 from urllib.parse import urlparse
 
+# One queue and listener thread per log file. Loggers only put records on
+# the queue, the listener does the formatting and the (blocking) writes to
+# the file and the console.
+_log_queues = dict()
+_log_lock = Lock()
+
+def _log_queue(filename):
+    with _log_lock:
+        if filename not in _log_queues:
+            if not os.path.exists("Logs"):
+                os.makedirs("Logs")
+            fh = logging.FileHandler(f"Logs/{filename}.log")
+            fh.setLevel(logging.DEBUG)
+            ch = logging.StreamHandler()
+            ch.setLevel(logging.INFO)
+            formatter = logging.Formatter(
+               "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+            fh.setFormatter(formatter)
+            ch.setFormatter(formatter)
+            records = queue.SimpleQueue()
+            listener = logging.handlers.QueueListener(
+                records, fh, ch, respect_handler_level=True)
+            listener.start()
+            # flush what is still queued when the crawler exits
+            atexit.register(listener.stop)
+            _log_queues[filename] = records
+        return _log_queues[filename]
+
 def get_logger(name, filename=None):
     logger = logging.getLogger(name)
+    if logger.handlers:
+        # already set up by an earlier call
+        return logger
     logger.setLevel(logging.INFO)
-    if not os.path.exists("Logs"):
-        os.makedirs("Logs")
-    fh = logging.FileHandler(f"Logs/{filename if filename else name}.log")
-    fh.setLevel(logging.DEBUG)
-    ch = logging.StreamHandler()
-    ch.setLevel(logging.INFO)
-    formatter = logging.Formatter(
-       "%(asctime)s - %(name)s - %(levelname)s - %(message)s")
-    fh.setFormatter(formatter)
-    ch.setFormatter(formatter)
-    # add the handlers to the logger
-    logger.addHandler(fh)
-    logger.addHandler(ch)
+    logger.addHandler(logging.handlers.QueueHandler(
+        _log_queue(filename if filename else name)))
     return logger
 
 
@@ -0,0 +1,193 @@
+import time
+import cbor
+import asyncio
+
+from urllib.parse import urlencode
+
+from utils.response import Response
+from utils.stats import stats
+
+
+class AsyncDownloadClient(object):
+    ''' Non-blocking counterpart of utils.download.DownloadClient for the
+    asyncio engine: a small HTTP/1.1 client that keeps up to
+    `max_connections` keep-alive connections to the cache server open and
+    shares them between coroutines. Same timeout, retry, backoff and
+    `max_bytes` rules and the same counters; responses are cut to
+    `parse_size` bytes and kept in `page_store` like those of
+    utils.download.download. '''
+
+    def __init__(self, cache_server, user_agent, timeout=10.0, retries=3,
+                 backoff=0.5, max_connections=100, max_bytes=0,
+                 parse_size=0, page_store=None):
+        self.host, self.port = cache_server
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self.parse_size = parse_size
+        self.page_store = page_store
+        self._idle = list()
+        self._slots = asyncio.Semaphore(max_connections)
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.oversized = 0
+        self.bytes = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    async def _read_response(self, reader):
+        status_line = await reader.readline()
+        if not status_line:
+            raise ConnectionResetError("Connection closed by cache server.")
+        version, status = status_line.split(None, 2)[:2]
+        headers = dict()
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if (self.max_bytes and headers.get("content-length", "").isdigit()
+                and int(headers["content-length"]) > self.max_bytes):
+            # the body is left unread, so the connection can't be reused
+            return int(status), None, False
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = list()
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if not size:
+                    # trailers
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readline()
+            body = b"".join(chunks)
+        else:
+            body = await reader.read()
+            headers["connection"] = "close"
+        keep_alive = (
+            headers.get("connection", "").lower() != "close"
+            and version == b"HTTP/1.1")
+        return int(status), body, keep_alive
+
+    async def _request(self, path):
+        request = (
+            f"GET {path} HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Connection: keep-alive\r\n\r\n").encode("ascii")
+        while True:
+            reused = bool(self._idle)
+            if reused:
+                reader, writer = self._idle.pop()
+            else:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, body, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                if reused:
+                    # The server dropped an idle connection, not a failure.
+                    continue
+                raise
+            except BaseException:
+                writer.close()
+                raise
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            return status, body
+
+    async def get(self, url):
+        ''' (status, body) of the cache server's answer for url, body None
+        if it is over max_bytes. '''
+        path = "/?" + urlencode([("q", f"{url}"), ("u", f"{self.user_agent}")])
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                async with self._slots:
+                    status, body = await asyncio.wait_for(
+                        self._request(path), self.timeout)
+                error = None
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError) as e:
+                status, body, error = None, b"", e
+            elapsed = time.perf_counter() - start
+            if body is None:
+                self.oversized += 1
+                stats.incr("download_oversized")
+                return status, None
+            self.requests += 1
+            self.latency += elapsed
+            self.max_latency = max(self.max_latency, elapsed)
+            self.bytes += len(body)
+            stats.observe("download", elapsed)
+            stats.incr("download_bytes", len(body))
+            if error is None and status < 500:
+                return status, body
+            if attempt >= self.retries:
+                self.failures += 1
+                stats.incr("download_failures")
+                if error is not None:
+                    raise error
+                return status, body
+            self.retried += 1
+            stats.incr("download_retries")
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    async def download(self, url, logger=None):
+        ''' Same result as utils.download.download. The answer is decoded
+        and stored on the loop's default executor, so the event loop only
+        waits on the network. '''
+        status, body = await self.get(url)
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self.response, url, status, body, logger)
+
+    def response(self, url, status, body, logger=None):
+        ''' The Response of get()'s (status, body), stored in page_store.
+        Blocking: it decodes the answer and writes the page. '''
+        resp = self._response(url, status, body, logger)
+        if self.page_store is not None:
+            self.page_store.put(url, resp)
+        return resp
+
+    def _response(self, url, status, body, logger):
+        if body is None:
+            return Response({
+                "error": f"Page over {self.max_bytes} bytes with url {url}.",
+                "status": None,
+                "url": url})
+        try:
+            if status < 400 and body:
+                return Response(cbor.loads(body), self.max_bytes, self.parse_size)
+        except (EOFError, ValueError) as e:
+            pass
+        logger.error(f"Spacetime Response error <Response [{status}]> with url {url}.")
+        return Response({
+            "error": f"Spacetime Response error <Response [{status}]> with url {url}.",
+            "status": status,
+            "url": url})
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retried": self.retried,
+            "failures": self.failures,
+            "oversized": self.oversized,
+            "bytes": self.bytes,
+            "mean_latency": self.latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency
+        }
+
+    async def close(self):
+        while self._idle:
+            _, writer = self._idle.pop()
+            writer.close()
@@ -0,0 +1,150 @@
+import re
+from functools import lru_cache
+from urllib.parse import urlsplit, unquote
+
+##################################### Rules, compiled once at import
+DEFAULT_PORTS = {"http": 80, "https": 443}
+# query parameters that never change the page: analytics, click ids,
+# session ids and share/reply links
+JUNK_PARAMS = frozenset([
+    "utm_source", "utm_medium", "utm_campaign", "utm_term", "utm_content",
+    "fbclid", "gclid", "msclkid", "mc_cid", "mc_eid", "_ga",
+    "sessionid", "session_id", "sid", "phpsessid", "jsessionid",
+    "share", "replytocom"])
+# apache directory listings sorted by another column (?C=M;O=D)
+LISTING_SORT_PATTERN = re.compile(r'^C=[NMSD](?:;O=[AD])?$')
+# the default document of a directory is the directory
+INDEX_PAGE_PATTERN = re.compile(
+    r'/(?:index|default)\.(?:html?|php|aspx?|shtml)$', re.IGNORECASE)
+PERCENT_ESCAPE_PATTERN = re.compile(r'%[0-9a-fA-F]{2}')
+UNRESERVED = frozenset(
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+# bare domains that serve the same site as their www host
+WWW_ALIASES = {
+    "ics.uci.edu": "www.ics.uci.edu",
+    "cs.uci.edu": "www.cs.uci.edu",
+    "informatics.uci.edu": "www.informatics.uci.edu",
+    "stat.uci.edu": "www.stat.uci.edu"}
+
+
+class HostRule(object):
+    ''' How the urls of the hosts matching `pattern` are canonicalized.
+        scheme: fetch every url of the host with this scheme, None keeps it
+        keep_params: if set, every other query parameter is dropped
+        drop_params: query parameters dropped on top of JUNK_PARAMS
+    '''
+    def __init__(self, pattern, scheme=None, keep_params=None, drop_params=()):
+        self.pattern = re.compile(pattern)
+        self.scheme = scheme
+        self.keep_params = frozenset(keep_params) if keep_params else None
+        self.drop_params = JUNK_PARAMS | frozenset(drop_params)
+
+
+# first match wins, DEFAULT_RULE if none does
+HOST_RULES = [
+    # the department sites are all served over https
+    HostRule(r'^www\.(?:ics|cs|informatics|stat)\.uci\.edu$', scheme="https"),
+    # dokuwiki: a page is its id, do=, rev=, tab_*= ... are views of it
+    HostRule(r'^(?:wiki|swiki)\.ics\.uci\.edu$', keep_params=["id"]),
+    # trac and mediawiki action views of a page
+    HostRule(r'\.ics\.uci\.edu$', drop_params=["oldid", "diff", "printable"])
+]
+DEFAULT_RULE = HostRule(r'')
+
+
+@lru_cache(maxsize=4096)
+def host_rule(hostname):
+    for rule in HOST_RULES:
+        if rule.pattern.search(hostname) is not None:
+            return rule
+    return DEFAULT_RULE
+
+
+def _normalize_escape(match):
+    # decode escapes of unreserved characters, upper-case the others
+    char = chr(int(match.group()[1:], 16))
+    return char if char in UNRESERVED else match.group().upper()
+
+
+def remove_dot_segments(path):
+    ''' RFC 3986 5.2.4: /a/./b/../c -> /a/c '''
+    if '.' not in path:
+        return path
+    output = list()
+    segments = path.split('/')
+    for segment in segments[1:]:
+        if segment == '.':
+            continue
+        if segment == '..':
+            if output:
+                output.pop()
+            continue
+        output.append(segment)
+    # a trailing dot segment leaves the directory
+    if segments[-1] in ('.', '..'):
+        output.append('')
+    return '/' + '/'.join(output)
+
+
+def canonicalize(url):
+    ''' The canonical form of an absolute url: lower-case host without
+    default port, www alias or userinfo, dot segments resolved, escapes
+    normalized, trailing slash and (without a query) index page dropped,
+    query parameters filtered by the host's rule and sorted by name, no
+    fragment. Urls that can't be parsed are returned unchanged.
+    Idempotent. '''
+    try:
+        parts = urlsplit(url.strip())
+        hostname = parts.hostname
+        port = parts.port
+    except ValueError:
+        return url
+    scheme = parts.scheme.lower()
+    if hostname is None or scheme not in DEFAULT_PORTS:
+        return url.split('#')[0]
+    hostname = hostname.rstrip('.')
+    hostname = WWW_ALIASES.get(hostname, hostname)
+    rule = host_rule(hostname)
+    if port == DEFAULT_PORTS[scheme]:
+        port = None
+    if rule.scheme is not None and port is None:
+        scheme = rule.scheme
+    if ':' in hostname:
+        # ipv6
+        hostname = f"[{hostname}]"
+    netloc = hostname if port is None else f"{hostname}:{port}"
+
+    path = parts.path
+    if '%' in path:
+        path = PERCENT_ESCAPE_PATTERN.sub(_normalize_escape, path)
+    path = remove_dot_segments(path)
+
+    query = parts.query
+    if query:
+        if LISTING_SORT_PATTERN.match(query) is not None:
+            query = ''
+        else:
+            params = list()
+            for param in query.split('&'):
+                if not param:
+                    continue
+                name = unquote(param.partition('=')[0]).lower()
+                if name in rule.drop_params:
+                    continue
+                if rule.keep_params is not None and name not in rule.keep_params:
+                    continue
+                params.append((name, param))
+            # stable, so repeated parameters keep their order (a=2&a=1)
+            params.sort(key=lambda item: item[0])
+            query = '&'.join(param for _, param in params)
+
+    if not query:
+        # index.php?id=4 is not the directory when its default document is
+        # another one, so the index page is only dropped without a query
+        path = INDEX_PAGE_PATTERN.sub('/', path)
+    # same as the old utils.normalize, /a/ and /a are one page
+    path = path.rstrip('/')
+    if query and not path:
+        path = '/'
+
+    return f"{scheme}://{netloc}{path}?{query}" if query else f"{scheme}://{netloc}{path}"
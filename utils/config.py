@@ -8,12 +8,51 @@ class Config(object):
         assert self.user_agent != "DEFAULT AGENT", "Set useragent in config.ini"
         assert re.match(r"^[a-zA-Z0-9_ ,]+$", self.user_agent), "User agent should not have any special characters outside '_', ',' and 'space'"
         self.threads_count = int(config["LOCAL PROPERTIES"]["THREADCOUNT"])
+        self.engine = config["LOCAL PROPERTIES"].get("ENGINE", "threads").strip()
+        assert self.engine in ("threads", "async", "pipeline"), "ENGINE should be threads, async or pipeline"
+        self.async_fetches = int(config["LOCAL PROPERTIES"].get("ASYNCFETCHES", "200"))
+        self.parse_processes = int(config["LOCAL PROPERTIES"].get("PARSEPROCESSES", "0"))
+        self.parse_queue = int(config["LOCAL PROPERTIES"].get("PARSEQUEUE", "64"))
         self.save_file = config["LOCAL PROPERTIES"]["SAVE"]
+        # Every downloaded page is kept here for launch.py --replay, "" to
+        # not keep them.
+        self.page_store = config["LOCAL PROPERTIES"].get("PAGESTORE", "").strip()
+        self.save_interval = float(
+            config["LOCAL PROPERTIES"].get("SAVEINTERVAL", "1.0"))
+        self.save_batch = int(config["LOCAL PROPERTIES"].get("SAVEBATCH", "1000"))
+        # Crawl statistics, see utils/stats.py.
+        self.stats = config["LOCAL PROPERTIES"].getboolean("STATS", False)
+        self.stats_file = config["LOCAL PROPERTIES"].get("STATSFILE", "stats.json")
+        self.stats_interval = float(
+            config["LOCAL PROPERTIES"].get("STATSINTERVAL", "10"))
+        self.stats_port = int(config["LOCAL PROPERTIES"].get("STATSPORT", "0"))
 
         self.host = config["CONNECTION"]["HOST"]
         self.port = int(config["CONNECTION"]["PORT"])
+        # Downloads from the cache server.
+        self.download_timeout = float(config["CONNECTION"].get("TIMEOUT", "10"))
+        self.download_retries = int(config["CONNECTION"].get("RETRIES", "3"))
+        self.download_backoff = float(config["CONNECTION"].get("BACKOFF", "0.5"))
 
         self.seed_urls = config["CRAWLER"]["SEEDURL"].split(",")
         self.time_delay = float(config["CRAWLER"]["POLITENESS"])
+        # Download the urls most likely to give new pages first, see
+        # crawler/priority.py. Off, each host's urls go newest first.
+        self.best_first = config["CRAWLER"].getboolean("BESTFIRST", True)
+        # Page size limits in bytes, 0 for none.
+        self.max_page_size = int(config["CRAWLER"].get("MAXPAGESIZE", "8000000"))
+        self.parse_size = int(config["CRAWLER"].get("PARSESIZE", "0"))
+
+        # Host partitioned crawl over several crawler nodes, see
+        # crawler/cluster.py. Each node crawls the hosts that hash to
+        # NODEINDEX and the nodes exchange outlinks through the dataframe
+        # server on DFHOST:DFPORT every SYNCINTERVAL seconds.
+        cluster = config["CLUSTER"] if config.has_section("CLUSTER") else dict()
+        self.nodes = int(cluster.get("NODES", "1"))
+        self.node_index = int(cluster.get("NODEINDEX", "0"))
+        assert 0 <= self.node_index < self.nodes, "NODEINDEX should be between 0 and NODES - 1"
+        self.dataframe_host = cluster.get("DFHOST", "127.0.0.1").strip()
+        self.dataframe_port = int(cluster.get("DFPORT", "9100"))
+        self.sync_interval = float(cluster.get("SYNCINTERVAL", "0.2"))
 
         self.cache_server = None
\ No newline at end of file
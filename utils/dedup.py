@@ -0,0 +1,337 @@
+import os
+import re
+
+import numpy as np
+
+from threading import RLock
+
+from utils import get_urlhash
+
+FINGERPRINT_BITS = 64
+SHINGLE_WIDTH = 3
+# Shingles are hashed and counted in chunks, so a page never needs more than
+# a few CHUNK sized arrays of scratch space however big it is.
+CHUNK = 1 << 16
+_NON_WORD = re.compile(r'[^\w]+')
+# _BYTE_BITS[v, i] is bit i of the byte value v
+_BYTE_BITS = np.unpackbits(
+    np.arange(256, dtype=np.uint8)[:, None], axis=1,
+    bitorder='little').astype(np.int64)
+# Header of the fingerprint log, whose records are (fingerprint, url id)
+# pairs. Logs without it hold bare fingerprints, of unknown urls (id 0).
+LOG_MAGIC = b"SIMHASH2"
+RECORD_BYTES = 16
+
+
+def _mix(h):
+    ''' splitmix64 finalizer, vectorized. '''
+    h = h ^ (h >> np.uint64(30))
+    h = h * np.uint64(0xBF58476D1CE4E5B9)
+    h = h ^ (h >> np.uint64(27))
+    h = h * np.uint64(0x94D049BB133111EB)
+    return h ^ (h >> np.uint64(31))
+
+
+if hasattr(np, "bitwise_count"):
+    def popcount(x):
+        return np.bitwise_count(x)
+else:
+    def popcount(x):
+        x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+        x = ((x & np.uint64(0x3333333333333333))
+             + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333)))
+        x = (x + (x >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+        return (x * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+
+def fingerprint(text):
+    ''' 64 bit Simhash of the character 3-grams of text (lower-cased,
+    non-word characters removed), like
+    https://leons.im/posts/a-python-implementation-of-simhash-algorithm/
+    but the shingles are hashed straight from the code point array instead
+    of being built as a list of strings. '''
+    s = _NON_WORD.sub('', text.lower())
+    codes = np.frombuffer(s.encode('utf-32-le'), dtype=np.uint32).astype(np.uint64)
+    if len(codes) < SHINGLE_WIDTH:
+        # one feature for the whole (short) string
+        codes = np.concatenate(
+            [codes, np.zeros(SHINGLE_WIDTH - len(codes), dtype=np.uint64)])
+    count = len(codes) - SHINGLE_WIDTH + 1
+    ones = np.zeros(FINGERPRINT_BITS, dtype=np.int64)
+    with np.errstate(over='ignore'):
+        for start in range(0, count, CHUNK):
+            end = min(start + CHUNK, count)
+            h = codes[start:end]
+            for i in range(1, SHINGLE_WIDTH):
+                h = _mix(h) ^ codes[start + i:end + i]
+            h = _mix(h)
+            # count the set bits of every bit position by histogramming each
+            # byte of the hashes
+            hash_bytes = h.astype('<u8').view(np.uint8).reshape(-1, 8)
+            for j in range(8):
+                histogram = np.bincount(hash_bytes[:, j], minlength=256)
+                ones[8 * j:8 * j + 8] += histogram @ _BYTE_BITS
+    # bit i of the fingerprint is set if most shingle hashes have it set
+    value = 0
+    for i in np.nonzero(2 * ones > count)[0]:
+        value |= 1 << int(i)
+    return value
+
+
+def url_id(url):
+    ''' The 64 bit id of url that is indexed with its page's fingerprint. '''
+    return int(get_urlhash(url)[:16], 16)
+
+
+def _rotl(x, r):
+    if r == 0:
+        return x
+    return (x << np.uint64(r)) | (x >> np.uint64(FINGERPRINT_BITS - r))
+
+
+class NearDuplicateIndex(object):
+    ''' Finds fingerprints within Hamming distance k (k=3) of a query.
+
+    The 64 bits are split into k + 1 blocks of 16, so a near duplicate
+    matches the query exactly in at least one block. Table b holds every
+    fingerprint rotated so that block b is the top 16 bits, as a sorted
+    uint64 array; one searchsorted per table yields the candidates. New
+    fingerprints go to a small tail that is scanned linearly and merged into
+    the tables every `merge_every` inserts.
+
+    Every fingerprint is indexed with the id of the url whose page it is
+    (url_id), and a page is not a duplicate of a fingerprint of its own url:
+    a url fetched again, because the crawl stopped before its completion
+    was saved, keeps its outlinks.
+
+    Fingerprints are appended to `path`; checkpoint() also writes the
+    sorted tables and their url ids next to it, and they are memory-mapped
+    on the next load so only fingerprints added after the checkpoint need
+    sorting. '''
+
+    def __init__(self, path=None, k=3, merge_every=4096):
+        assert FINGERPRINT_BITS % (k + 1) == 0
+        self.path = path
+        self.k = k
+        self.merge_every = merge_every
+        self.block_bits = FINGERPRINT_BITS // (k + 1)
+        self._lock = RLock()
+        self._log = None
+        self._loaded = False
+        self._clear()
+
+    def _clear(self):
+        self._tables = [
+            np.zeros(0, dtype=np.uint64) for _ in range(self.k + 1)]
+        # the url id of every table entry, in table order
+        self._urls = [
+            np.zeros(0, dtype=np.uint64) for _ in range(self.k + 1)]
+        # fingerprints not merged into the tables yet
+        self._tail = np.zeros(self.merge_every, dtype=np.uint64)
+        self._tail_urls = np.zeros(self.merge_every, dtype=np.uint64)
+        self._tail_len = 0
+        self._count = 0
+
+    def _table_file(self, b):
+        return f"{self.path}.t{b}"
+
+    def _url_file(self, b):
+        return f"{self.path}.u{b}"
+
+    def _read_log(self):
+        ''' The fingerprints and url ids of the log. A log of bare
+        fingerprints is converted first, a torn last record cut off. '''
+        with open(self.path, "rb") as log:
+            magic = log.read(len(LOG_MAGIC))
+        if magic != LOG_MAGIC:
+            fingerprints = np.fromfile(self.path, dtype='<u8')
+            records = np.zeros((len(fingerprints), 2), dtype='<u8')
+            records[:, 0] = fingerprints
+            tmp_file = f"{self.path}.tmp"
+            with open(tmp_file, "wb") as log:
+                log.write(LOG_MAGIC)
+                records.tofile(log)
+            os.replace(tmp_file, self.path)
+        size, torn = divmod(
+            os.path.getsize(self.path) - len(LOG_MAGIC), RECORD_BYTES)
+        if torn:
+            # later records are appended after the last whole one
+            os.truncate(self.path, len(LOG_MAGIC) + size * RECORD_BYTES)
+        if not size:
+            return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.uint64)
+        records = np.memmap(
+            self.path, dtype='<u8', mode='r', offset=len(LOG_MAGIC),
+            shape=(size, 2))
+        return records[:, 0], records[:, 1]
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        fingerprints, urls = self._read_log()
+        size = len(fingerprints)
+        if not size:
+            return
+        checkpointed = 0
+        table_files = [self._table_file(b) for b in range(self.k + 1)]
+        url_files = [self._url_file(b) for b in range(self.k + 1)]
+        if all(os.path.exists(name) for name in table_files + url_files):
+            sizes = {
+                os.path.getsize(name) // 8 for name in table_files + url_files}
+            # Tables of different sizes mean a crash in the middle of
+            # checkpoint(), they are rebuilt from the fingerprints then.
+            if len(sizes) == 1:
+                checkpointed = sizes.pop()
+        if 0 < checkpointed <= size:
+            self._tables = [
+                np.memmap(name, dtype='<u8', mode='r', shape=(checkpointed,))
+                for name in table_files]
+            self._urls = [
+                np.memmap(name, dtype='<u8', mode='r', shape=(checkpointed,))
+                for name in url_files]
+        else:
+            checkpointed = 0
+        self._count = checkpointed
+        self._append(
+            np.array(fingerprints[checkpointed:], dtype=np.uint64),
+            np.array(urls[checkpointed:], dtype=np.uint64))
+
+    def _append(self, fps, urls):
+        self._count += len(fps)
+        if self._tail_len + len(fps) < self.merge_every:
+            end = self._tail_len + len(fps)
+            self._tail[self._tail_len:end] = fps
+            self._tail_urls[self._tail_len:end] = urls
+            self._tail_len = end
+        else:
+            self._merge(fps, urls)
+
+    def _merge(self, extra=None, extra_urls=None):
+        fps = self._tail[:self._tail_len]
+        urls = self._tail_urls[:self._tail_len]
+        if extra is not None:
+            fps = np.concatenate([fps, extra])
+            urls = np.concatenate([urls, extra_urls])
+        if not len(fps):
+            return
+        tables = list()
+        url_tables = list()
+        for b, (table, table_urls) in enumerate(zip(self._tables, self._urls)):
+            rotated = _rotl(fps, b * self.block_bits)
+            order = np.argsort(rotated, kind='stable')
+            rotated = rotated[order]
+            # The table is sorted already: the positions of the new
+            # fingerprints are found by binary search and they are inserted
+            # in one linear pass.
+            positions = np.searchsorted(table, rotated, side='right')
+            tables.append(np.insert(table, positions, rotated))
+            url_tables.append(np.insert(table_urls, positions, urls[order]))
+        self._tables = tables
+        self._urls = url_tables
+        self._tail_len = 0
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._count
+
+    def find(self, fp, url=None):
+        ''' True if some indexed fingerprint is within distance k of fp,
+        not counting those of `url`. '''
+        return self._find(fp, None if url is None else url_id(url))
+
+    def _find(self, fp, own):
+        with self._lock:
+            self._ensure_loaded()
+            query = np.uint64(fp)
+            shift = np.uint64(FINGERPRINT_BITS - self.block_bits)
+            for b, (table, table_urls) in enumerate(zip(self._tables, self._urls)):
+                if not len(table):
+                    continue
+                rotated = _rotl(query, b * self.block_bits)
+                low = (rotated >> shift) << shift
+                high = low | ((np.uint64(1) << shift) - np.uint64(1))
+                start = np.searchsorted(table, low, side='left')
+                end = np.searchsorted(table, high, side='right')
+                if start < end:
+                    near = popcount(table[start:end] ^ rotated) <= self.k
+                    if own is not None:
+                        near &= table_urls[start:end] != np.uint64(own)
+                    if near.any():
+                        return True
+            if self._tail_len:
+                near = popcount(self._tail[:self._tail_len] ^ query) <= self.k
+                if own is not None:
+                    near &= self._tail_urls[:self._tail_len] != np.uint64(own)
+                if near.any():
+                    return True
+            return False
+
+    def add(self, fp, url=None):
+        self.add_many([fp], None if url is None else [url])
+
+    def add_many(self, fps, urls=None):
+        ''' Index fingerprints, of the pages of `urls` if given. '''
+        ids = [0] * len(fps) if urls is None else [url_id(url) for url in urls]
+        self._add_many(fps, ids)
+
+    def _add_many(self, fps, ids):
+        with self._lock:
+            self._ensure_loaded()
+            records = np.empty((len(fps), 2), dtype='<u8')
+            records[:, 0] = np.array([int(fp) for fp in fps], dtype=np.uint64)
+            records[:, 1] = np.array([int(own) for own in ids], dtype=np.uint64)
+            if self.path:
+                if self._log is None:
+                    self._log = open(self.path, "ab")
+                    if not self._log.tell():
+                        self._log.write(LOG_MAGIC)
+                self._log.write(records.tobytes())
+                self._log.flush()
+            records = records.astype(np.uint64)
+            self._append(records[:, 0], records[:, 1])
+
+    def check_and_add(self, fp, url=None):
+        ''' Atomically: return True if fp is a (near) duplicate of a page
+        other than `url`, otherwise index it and return False. '''
+        own = None if url is None else url_id(url)
+        with self._lock:
+            if self._find(fp, own):
+                return True
+            self._add_many([fp], [own or 0])
+            return False
+
+    def checkpoint(self):
+        ''' Write the sorted tables so the next load can memory-map them. '''
+        with self._lock:
+            self._ensure_loaded()
+            if not self.path:
+                return
+            self._merge()
+            for b, (table, table_urls) in enumerate(zip(self._tables, self._urls)):
+                for name, array in (
+                        (self._table_file(b), table),
+                        (self._url_file(b), table_urls)):
+                    tmp_file = f"{name}.tmp"
+                    array.astype('<u8').tofile(tmp_file)
+                    os.replace(tmp_file, name)
+
+    def reset(self):
+        with self._lock:
+            self.close()
+            if self.path:
+                for name in [self.path] + [
+                        name(b) for b in range(self.k + 1)
+                        for name in (self._table_file, self._url_file)]:
+                    if os.path.exists(name):
+                        os.remove(name)
+            self._clear()
+            self._loaded = True
+
+    def close(self):
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
@@ -2,16 +2,151 @@ import requests
 import cbor
 import time
 
+from threading import local, Lock
+from requests.adapters import HTTPAdapter
+
 from utils.response import Response
+from utils.page_store import get_page_store
+from utils.stats import stats
+
+
+class DownloadClient(object):
+    ''' Keep-alive client for the cache server. Every thread gets its own
+    requests.Session, so its connection is reused across downloads instead
+    of a new TCP handshake per url. Requests time out after `timeout`
+    seconds, and connection errors and 5xx answers from the cache server are
+    retried up to `retries` times with exponential backoff. Answers whose
+    Content-Length is over `max_bytes` are not read at all (0 for no
+    limit). '''
+
+    def __init__(self, cache_server, user_agent, timeout=10.0, retries=3,
+                 backoff=0.5, max_bytes=0):
+        host, port = cache_server
+        self.endpoint = f"http://{host}:{port}/"
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self._local = local()
+        self._lock = Lock()
+        self.requests = 0
+        self.retried = 0
+        self.failures = 0
+        self.oversized = 0
+        self.bytes = 0
+        self.latency = 0.0
+        self.max_latency = 0.0
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+            self._local.session = session
+        return session
+
+    def get(self, url):
+        ''' The raw http response of the cache server for url, or None if
+        it is over max_bytes. '''
+        params = [("q", f"{url}"), ("u", f"{self.user_agent}")]
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                resp = self._session().get(
+                    self.endpoint, params=params, timeout=self.timeout,
+                    stream=True)
+                if self._oversized(resp):
+                    resp.close()
+                    with self._lock:
+                        self.oversized += 1
+                    stats.incr("download_oversized")
+                    return None
+                # read the body here, so it counts towards the latency
+                resp.content
+                error = None
+            except (requests.ConnectionError, requests.Timeout) as e:
+                resp, error = None, e
+            elapsed = time.perf_counter() - start
+            size = len(resp.content) if resp is not None else 0
+            with self._lock:
+                self.requests += 1
+                self.latency += elapsed
+                self.max_latency = max(self.max_latency, elapsed)
+                self.bytes += size
+            stats.observe("download", elapsed)
+            stats.incr("download_bytes", size)
+            if error is None and resp.status_code < 500:
+                return resp
+            if attempt >= self.retries:
+                with self._lock:
+                    self.failures += 1
+                stats.incr("download_failures")
+                if error is not None:
+                    raise error
+                return resp
+            with self._lock:
+                self.retried += 1
+            stats.incr("download_retries")
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def _oversized(self, resp):
+        length = resp.headers.get("Content-Length")
+        return bool(
+            self.max_bytes and length and length.isdigit()
+            and int(length) > self.max_bytes)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "retried": self.retried,
+                "failures": self.failures,
+                "oversized": self.oversized,
+                "bytes": self.bytes,
+                "mean_latency": self.latency / self.requests if self.requests else 0.0,
+                "max_latency": self.max_latency
+            }
+
+
+_clients = dict()
+_clients_lock = Lock()
+
+
+def get_client(config):
+    ''' The shared DownloadClient for the config's cache server. '''
+    key = (tuple(config.cache_server), config.user_agent)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = DownloadClient(
+                config.cache_server, config.user_agent,
+                config.download_timeout, config.download_retries,
+                config.download_backoff, config.max_page_size)
+        return _clients[key]
+
 
 def download(url, config, logger=None):
-    host, port = config.cache_server
-    resp = requests.get(
-        f"http://{host}:{port}/",
-        params=[("q", f"{url}"), ("u", f"{config.user_agent}")])
+    resp = _download(url, config, logger)
+    page_store = get_page_store(config)
+    if page_store is not None:
+        page_store.put(url, resp)
+    return resp
+
+
+def _download(url, config, logger=None):
+    resp = get_client(config).get(url)
+    if resp is None:
+        return Response({
+            "error": f"Page over {config.max_page_size} bytes with url {url}.",
+            "status": None,
+            "url": url})
     try:
         if resp and resp.content:
-            return Response(cbor.loads(resp.content))
+            return Response(
+                cbor.loads(resp.content), config.max_page_size,
+                config.parse_size)
     except (EOFError, ValueError) as e:
         pass
     logger.error(f"Spacetime Response error {resp} with url {url}.")
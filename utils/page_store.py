@@ -0,0 +1,195 @@
+import os
+import time
+import zlib
+import atexit
+import shutil
+import sqlite3
+
+from hashlib import sha256
+from threading import RLock, Lock
+
+from utils.response import Response
+
+
+class PageStore(object):
+    ''' Every downloaded page of a crawl, so the scraper can be re-run over
+    them without the cache server (launch.py --replay).
+
+    Bodies are content addressed: each distinct body is zlib compressed
+    once and appended to the current segment file (segment-NNNNN.dat, a new
+    one every `segment_size` bytes). An SQLite index in the same directory
+    maps every url, in fetch order, to its status, content type and the
+    segment, offset and length of its body. Index writes are committed
+    every `commit_batch` pages or `commit_interval` seconds, like the
+    frontier's; a crash loses at most that window, and bodies written
+    after the last commit are just unreferenced. '''
+
+    def __init__(self, path, segment_size=64 << 20, level=6,
+                 commit_interval=1.0, commit_batch=1000):
+        self.path = path
+        self.segment_size = segment_size
+        self.level = level
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self._lock = RLock()
+        os.makedirs(path, exist_ok=True)
+        self._conn = sqlite3.connect(
+            os.path.join(path, "index.db"), check_same_thread=False,
+            isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "seq INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, "
+            "status INTEGER, error TEXT, content_type TEXT, digest TEXT)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            "digest TEXT PRIMARY KEY, segment INTEGER NOT NULL, "
+            "offset INTEGER NOT NULL, length INTEGER NOT NULL, "
+            "size INTEGER NOT NULL)")
+        self._dirty = 0
+        self._last_commit = time.monotonic()
+        self._closed = False
+        self._segment = self._conn.execute(
+            "SELECT COALESCE(MAX(segment), 0) FROM blobs").fetchone()[0]
+        self._writer = open(self._segment_file(self._segment), "ab")
+        atexit.register(self.close)
+
+    @staticmethod
+    def remove(path):
+        if os.path.exists(path):
+            shutil.rmtree(path)
+
+    def _segment_file(self, segment):
+        return os.path.join(self.path, f"segment-{segment:05d}.dat")
+
+    def commit(self):
+        with self._lock:
+            if self._conn.in_transaction:
+                self._writer.flush()
+                self._conn.execute("COMMIT")
+            self._dirty = 0
+            self._last_commit = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self.commit()
+            self._closed = True
+            self._writer.close()
+            self._conn.close()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def put(self, url, resp):
+        ''' Store the downloaded Response of url. Bodies are kept for 200
+        answers only, the scraper never looks at the others. '''
+        body = None
+        content_type = ""
+        if resp.status == 200 and resp.raw_response is not None:
+            body = resp.raw_response.content
+            content_type = resp.content_type
+        digest = sha256(body).hexdigest() if body is not None else None
+        data = None
+        if digest is not None and not self._has_blob(digest):
+            # compressed outside the lock, other workers keep storing
+            data = zlib.compress(body, self.level)
+        with self._lock:
+            if self._closed:
+                return
+            if not self._conn.in_transaction:
+                self._conn.execute("BEGIN")
+            if data is not None and not self._has_blob(digest):
+                self._write_blob(digest, data, len(body))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages "
+                "(url, status, error, content_type, digest) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, resp.status, resp.error, content_type, digest))
+            self._dirty += 1
+            if (self._dirty >= self.commit_batch or
+                    time.monotonic() - self._last_commit >= self.commit_interval):
+                self.commit()
+
+    def _has_blob(self, digest):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM blobs WHERE digest = ?",
+                (digest,)).fetchone() is not None
+
+    def _write_blob(self, digest, data, size):
+        # Caller holds the lock.
+        offset = self._writer.tell()
+        if offset and offset + len(data) > self.segment_size:
+            self._writer.close()
+            self._segment += 1
+            self._writer = open(self._segment_file(self._segment), "ab")
+            offset = 0
+        self._writer.write(data)
+        self._conn.execute(
+            "INSERT INTO blobs (digest, segment, offset, length, size) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (digest, self._segment, offset, len(data), size))
+
+    def pages(self, chunk=1000):
+        ''' (url, status, error, content_type, segment_file, offset, length)
+        of every page in fetch order, the last three None without a body.
+        Read a chunk at a time, the index is never in memory at once. '''
+        self.commit()
+        after = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT pages.seq, url, status, error, content_type, "
+                    "segment, offset, length FROM pages "
+                    "LEFT JOIN blobs ON pages.digest = blobs.digest "
+                    "WHERE pages.seq > ? ORDER BY pages.seq LIMIT ?",
+                    (after, chunk)).fetchall()
+            if not rows:
+                return
+            for after, url, status, error, content_type, segment, offset, length in rows:
+                segment_file = (
+                    self._segment_file(segment) if segment is not None else None)
+                yield url, status, error, content_type, segment_file, offset, length
+
+    def stats(self):
+        ''' Pages, distinct bodies, their bytes and their compressed bytes. '''
+        with self._lock:
+            pages = self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+            bodies, size, length = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), "
+                "COALESCE(SUM(length), 0) FROM blobs").fetchone()
+        return {"pages": pages, "bodies": bodies, "bytes": size,
+                "compressed_bytes": length}
+
+
+def read_body(segment_file, offset, length):
+    ''' A body of a PageStore, given its place from PageStore.pages(). Needs
+    no store, so parser processes can read pages themselves. '''
+    with open(segment_file, "rb") as segment:
+        segment.seek(offset)
+        return zlib.decompress(segment.read(length))
+
+
+def stored_response(page, parse_size=0):
+    ''' The Response of a PageStore.pages() entry. '''
+    url, status, error, content_type, segment_file, offset, length = page
+    body = read_body(segment_file, offset, length) if segment_file else None
+    return Response.from_page(url, status, body, content_type, error, parse_size)
+
+
+_stores = dict()
+_stores_lock = Lock()
+
+
+def get_page_store(config):
+    ''' The shared PageStore of config.page_store, None if it is not set. '''
+    if not config.page_store:
+        return None
+    with _stores_lock:
+        if config.page_store not in _stores:
+            _stores[config.page_store] = PageStore(config.page_store)
+        return _stores[config.page_store]
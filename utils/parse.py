@@ -0,0 +1,104 @@
+import re
+
+from lxml import etree
+from bs4.dammit import EncodingDetector
+
+WORD_PATTERN = re.compile(r"[a-zA-Z][a-zA-Z0-9]+'?[a-zA-Z0-9]*")
+# Text inside these tags is not part of BeautifulSoup's get_text().
+HIDDEN_TAGS = {'script', 'style', 'template', 'rt', 'rp'}
+# Whitespace-only strings inside these tags are kept as they are.
+PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+
+class ParsedPage(object):
+    ''' Everything the scraper needs from a page, produced by one pass of the
+    parser over the document.
+        text: the visible text, identical to BeautifulSoup(...).get_text()
+        words: the lower-cased word tokens of text
+        hrefs: the href of every <a> tag in document order, None if missing
+    '''
+    def __init__(self, text, hrefs):
+        self.text = text
+        self.hrefs = hrefs
+        self.words = [word.lower() for word in WORD_PATTERN.findall(text)]
+
+    @property
+    def char_count(self):
+        return len(self.text)
+
+
+class _PageTarget(object):
+    ''' lxml parser target that collects text and hrefs as the events come
+    in, without building a tree. Mirrors how BeautifulSoup groups and
+    collapses strings so the text comes out the same. '''
+
+    def __init__(self):
+        self.chunks = list()
+        self.hrefs = list()
+        self._data = list()
+        self._hidden = 0
+        self._preserve = 0
+
+    def _end_data(self, visible=True):
+        if not self._data:
+            return
+        data = "".join(self._data)
+        self._data = list()
+        if not visible or self._hidden:
+            return
+        if not self._preserve and not data.strip(ASCII_SPACES):
+            data = "\n" if "\n" in data else " "
+        self.chunks.append(data)
+
+    def start(self, tag, attrib, nsmap=None):
+        self._end_data()
+        if tag in HIDDEN_TAGS:
+            self._hidden += 1
+        if tag in PRESERVE_WHITESPACE_TAGS:
+            self._preserve += 1
+        if tag == 'a':
+            self.hrefs.append(attrib.get('href'))
+
+    def end(self, tag):
+        self._end_data()
+        if tag in HIDDEN_TAGS and self._hidden:
+            self._hidden -= 1
+        if tag in PRESERVE_WHITESPACE_TAGS and self._preserve:
+            self._preserve -= 1
+
+    def data(self, content):
+        self._data.append(content)
+
+    def comment(self, text):
+        self._end_data()
+
+    def doctype(self, *args):
+        self._end_data()
+
+    def pi(self, *args):
+        self._end_data()
+
+    def close(self):
+        self._end_data()
+        return ParsedPage("".join(self.chunks), self.hrefs)
+
+
+def parse_page(content):
+    ''' Parse raw page content (bytes or str) in a single streaming pass.
+    Encodings are tried in the same order BeautifulSoup tries them. '''
+    if isinstance(content, str):
+        candidates = [(content, None)]
+    else:
+        detector = EncodingDetector(content, is_html=True)
+        candidates = [
+            (detector.markup, encoding) for encoding in detector.encodings]
+    for markup, encoding in candidates:
+        try:
+            parser = etree.HTMLParser(
+                target=_PageTarget(), recover=True, encoding=encoding)
+            parser.feed(markup)
+            return parser.close()
+        except (UnicodeDecodeError, LookupError, etree.ParserError):
+            continue
+    return ParsedPage("", list())
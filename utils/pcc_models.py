@@ -13,3 +13,56 @@ class Register(object):
         self.load_balancer = tuple()
         self.fresh = fresh
         self.invalid = False
+
+
+@pcc_set
+class Outlinks(object):
+    ''' A batch of urls found by crawler node `source` on hosts that
+    crawler node `node` owns, and their link depths. The owner deletes it
+    once queued. '''
+    batch_id = primarykey(str)
+    node = dimension(int)
+    source = dimension(int)
+    urls = dimension(list)
+    depths = dimension(list)
+
+    def __init__(self, batch_id, node, source, urls, depths):
+        self.batch_id = batch_id
+        self.node = node
+        self.source = source
+        self.urls = urls
+        self.depths = depths
+
+
+@pcc_set
+class CrawlNode(object):
+    ''' Progress of one crawler node of a partitioned crawl: how many
+    Outlinks batches it sent and received, whether it has run out of work,
+    how many times it synced, and (on node 0) whether the whole crawl is
+    over. '''
+    node = primarykey(int)
+    syncs = dimension(int)
+    sent = dimension(int)
+    received = dimension(int)
+    idle = dimension(bool)
+    finished = dimension(bool)
+
+    def __init__(self, node):
+        self.node = node
+        self.syncs = 0
+        self.sent = 0
+        self.received = 0
+        self.idle = False
+        self.finished = False
+
+
+@pcc_set
+class NodeReport(object):
+    ''' The report statistics of one crawler node once it is done, as the
+    json of utils.report.ReportStore.snapshot(). '''
+    node = primarykey(int)
+    report = dimension(str)
+
+    def __init__(self, node, report):
+        self.node = node
+        self.report = report
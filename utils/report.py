@@ -0,0 +1,267 @@
+import os
+import json
+import time
+
+from collections import Counter
+from threading import RLock, Lock, local
+
+from utils.topk import TopKCounter
+
+
+class _Shard(object):
+    ''' The pages one thread recorded since its last merge. Only the owning
+    thread adds to it, the lock is there for flush() taking it over. '''
+
+    def __init__(self):
+        self.lock = Lock()
+        self._clear()
+
+    def _clear(self):
+        self.pages = list()
+        self.frequencies = Counter()
+        self.started = time.monotonic()
+
+    def add(self, url, num_words, frequencies, subdomain):
+        self.pages.append([url, num_words, subdomain])
+        self.frequencies.update(frequencies)
+
+    def take(self):
+        ''' The recorded pages and their summed frequencies, or None. '''
+        if not self.pages:
+            return None
+        batch = (self.pages, self.frequencies)
+        self._clear()
+        return batch
+
+
+class ReportStore(object):
+    ''' Keeps the report statistics in memory and persists them as a
+    compacted snapshot (<path>.json) plus an append-only delta log
+    (<path>.log), so recording a page costs O(page) instead of O(crawl).
+    A snapshot is only written once the log has grown as large as the last
+    snapshot, which keeps the amortized compaction cost per page flat.
+
+    Every thread records into a shard of its own, which is merged into the
+    report (and appended to the log as one delta) every `merge_every` pages
+    or `merge_interval` seconds, so workers do not contend for the report
+    lock per page. flush() merges all shards; everything that reads the
+    report calls it, and so does the frontier before it commits urls as
+    complete: a shard is only merged by its own thread otherwise, and its
+    pages would be lost in a crash. Word frequencies are a TopKCounter of at
+    most 2 * `vocabulary` words that keeps the `top` most frequent ones up
+    to date. '''
+
+    def __init__(self, path, compact_every=1000, merge_every=256,
+                 merge_interval=1.0, vocabulary=200000, top=50):
+        self.snapshot_file = f"{path}.json"
+        self.log_file = f"{path}.log"
+        self.compact_every = compact_every
+        self.merge_every = merge_every
+        self.merge_interval = merge_interval
+        self.vocabulary = vocabulary
+        self.top = top
+        self._lock = RLock()
+        self._local = local()
+        self._shards = list()
+        self._log = None
+        self._loaded = False
+        self._clear()
+
+    def _clear(self):
+        # report 1
+        self.unique_links = set()
+        # report 2
+        self.max_word_link = ''
+        self.max_words = -1
+        # report 3
+        self.frequencies = TopKCounter(self.vocabulary, self.top)
+        # report 4
+        self.domainList = dict()
+        # number of deltas folded into the state, and how many (and how many
+        # bytes) since the last snapshot was written.
+        self.seq = 0
+        self._pending = 0
+        self._log_bytes = 0
+        self._snapshot_bytes = 0
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if os.path.exists(self.snapshot_file):
+            with open(self.snapshot_file, "r") as readfile:
+                data = json.load(readfile)
+            self.frequencies = TopKCounter(
+                self.vocabulary, self.top, data['frequency_dict'],
+                data.get('frequency_error', 0))
+            self.unique_links = set(data['unique_links'])
+            self.max_word_link = data['max_word_link']
+            self.max_words = data['max_words']
+            self.domainList = data['domainList']
+            # Snapshots written by the old report_data.json code have no seq.
+            self.seq = data.get('seq', 0)
+            self._snapshot_bytes = os.path.getsize(self.snapshot_file)
+        if os.path.exists(self.log_file):
+            with open(self.log_file, "r") as readfile:
+                for line in readfile:
+                    try:
+                        delta = json.loads(line)
+                    except ValueError:
+                        # Torn write from a crash, everything after it is lost.
+                        break
+                    # Deltas already folded into the snapshot are skipped, in
+                    # case we crashed between writing a snapshot and
+                    # truncating the log.
+                    if delta['seq'] > self.seq:
+                        self._apply(delta)
+                        self._pending += len(delta.get('pages', [None]))
+                        self._log_bytes += len(line)
+
+    def _apply(self, delta):
+        self.seq = delta['seq']
+        # deltas of a single page were written before the shards
+        pages = delta.get('pages') or [
+            [delta['url'], delta['words'], delta['subdomain']]]
+        for url, num_words, subdomain in pages:
+            self.unique_links.add(url)
+            if self.max_words < num_words:
+                self.max_words = num_words
+                self.max_word_link = url
+            if subdomain:
+                self.domainList[subdomain] = self.domainList.get(subdomain, 0) + 1
+        self.frequencies.update(delta['freq'])
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def record_page(self, url, num_words, frequencies, subdomain=None):
+        ''' Add the statistics of one page to this thread's shard, merging
+        it if it is due. frequencies maps token -> count for the page. '''
+        shard = self._shard()
+        with shard.lock:
+            shard.add(url, num_words, frequencies, subdomain)
+            due = (len(shard.pages) >= self.merge_every
+                   or time.monotonic() - shard.started >= self.merge_interval)
+        if due:
+            # The report lock is taken first, like flush() does, so a flush
+            # never misses a batch that was taken but not merged yet.
+            with self._lock:
+                with shard.lock:
+                    batch = shard.take()
+                if batch is not None:
+                    self._merge(batch)
+
+    def _merge(self, batch):
+        ''' Fold a shard's pages into the report and append them to the log
+        as one delta. '''
+        pages, frequencies = batch
+        with self._lock:
+            self._ensure_loaded()
+            delta = {
+                'seq': self.seq + 1,
+                'pages': pages,
+                'freq': frequencies
+            }
+            self._apply(delta)
+            if self._log is None:
+                self._log = open(self.log_file, "a")
+            line = json.dumps(delta) + "\n"
+            self._log.write(line)
+            self._log.flush()
+            self._pending += len(pages)
+            self._log_bytes += len(line)
+            if (self._pending >= self.compact_every
+                    and self._log_bytes >= self._snapshot_bytes):
+                self.compact()
+
+    def flush(self):
+        ''' Merge the pages of every thread's shard into the report. '''
+        with self._lock:
+            for shard in self._shards:
+                with shard.lock:
+                    batch = shard.take()
+                if batch is not None:
+                    self._merge(batch)
+
+    def snapshot(self):
+        ''' All statistics as one json-able dict, the snapshot format. '''
+        with self._lock:
+            self._ensure_loaded()
+            self.flush()
+            return {
+                'frequency_dict': self.frequencies.counts,
+                'frequency_error': self.frequencies.error,
+                'unique_links' : list(self.unique_links),
+                'max_word_link' : self.max_word_link,
+                'max_words' : self.max_words,
+                'domainList' : self.domainList,
+                'seq': self.seq
+            }
+
+    def merge(self, data):
+        ''' Add the statistics of another report's snapshot(), e.g. of
+        another crawler node. The error bounds of the word counts add up. '''
+        with self._lock:
+            self._ensure_loaded()
+            self.flush()
+            self.unique_links.update(data['unique_links'])
+            if self.max_words < data['max_words']:
+                self.max_words = data['max_words']
+                self.max_word_link = data['max_word_link']
+            for subdomain, count in data['domainList'].items():
+                self.domainList[subdomain] = self.domainList.get(subdomain, 0) + count
+            self.frequencies.update(data['frequency_dict'])
+            self.frequencies.error += data.get('frequency_error', 0)
+            self.compact()
+
+    def compact(self):
+        ''' Write a full snapshot and truncate the delta log. '''
+        with self._lock:
+            data = json.dumps(self.snapshot())
+            tmp_file = f"{self.snapshot_file}.tmp"
+            with open(tmp_file, "w") as outfile:
+                outfile.write(data)
+                outfile.flush()
+                os.fsync(outfile.fileno())
+            os.replace(tmp_file, self.snapshot_file)
+            if self._log is not None:
+                self._log.close()
+            self._log = open(self.log_file, "w")
+            self._pending = 0
+            self._log_bytes = 0
+            self._snapshot_bytes = len(data)
+
+    def reset(self):
+        ''' Drop all statistics, in memory and on disk. '''
+        with self._lock:
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+            for path in (self.snapshot_file, self.log_file):
+                if os.path.exists(path):
+                    os.remove(path)
+            for shard in self._shards:
+                with shard.lock:
+                    shard.take()
+            self._clear()
+            self._loaded = True
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            if self._loaded and self._pending:
+                self.compact()
+            if self._log is not None:
+                self._log.close()
+                self._log = None
+
+    def top_words(self, n):
+        with self._lock:
+            self._ensure_loaded()
+            self.flush()
+            return self.frequencies.top(n)
@@ -1,14 +1,72 @@
 import pickle
 
+class StoredPage(object):
+    ''' The parts of a requests.Response the scraper uses, for pages that
+    come from utils/page_store.py instead of the cache server. '''
+    def __init__(self, url, status, content, content_type):
+        self.url = url
+        self.status_code = status
+        self.content = content
+        self.headers = {"Content-Type": content_type} if content_type else dict()
+
 class Response(object):
-    def __init__(self, resp_dict):
+    ''' A cache server answer. raw_response, the pickled requests.Response,
+    is only unpickled when it is first used, so answers that are rejected on
+    their status never pay for it. Answers whose pickled response is larger
+    than `max_size` bytes are dropped unread, and `content` is the body cut
+    to `parse_size` bytes (0 for no limit on either). '''
+
+    def __init__(self, resp_dict, max_size=0, parse_size=0):
         self.url = resp_dict["url"]
         self.status = resp_dict["status"]
         self.error = resp_dict["error"] if "error" in resp_dict else None
-        try:
-            self.raw_response = (
-                pickle.loads(resp_dict["response"])
-                if "response" in resp_dict else
-                None)
-        except TypeError:
-            self.raw_response = None
+        self.parse_size = parse_size
+        self._pickled = resp_dict["response"] if "response" in resp_dict else None
+        self._raw_response = None
+        self.size = len(self._pickled) if isinstance(self._pickled, bytes) else 0
+        if max_size and self.size > max_size:
+            self._pickled = None
+            self.error = f"Page of {self.size} bytes is over the {max_size} bytes limit."
+
+    @classmethod
+    def from_page(cls, url, status, content, content_type="", error=None,
+                  parse_size=0):
+        ''' The Response of an already downloaded page. '''
+        resp = cls({"url": url, "status": status, "error": error},
+                   parse_size=parse_size)
+        if content is not None:
+            resp._raw_response = StoredPage(url, status, content, content_type)
+        return resp
+
+    @property
+    def raw_response(self):
+        if self._pickled is not None:
+            try:
+                self._raw_response = pickle.loads(self._pickled)
+            except TypeError:
+                self._raw_response = None
+            # one copy of the page is enough
+            self._pickled = None
+        return self._raw_response
+
+    @property
+    def content_type(self):
+        ''' The page's Content-Type header, "" if there is none. '''
+        if self.raw_response is None:
+            return ""
+        return self.raw_response.headers.get("Content-Type", "") or ""
+
+    @property
+    def truncated(self):
+        return bool(
+            self.parse_size and self.raw_response is not None
+            and len(self.raw_response.content) > self.parse_size)
+
+    @property
+    def content(self):
+        ''' The body, cut to parse_size bytes. '''
+        if self.raw_response is None:
+            return None
+        if self.parse_size:
+            return self.raw_response.content[:self.parse_size]
+        return self.raw_response.content
@@ -0,0 +1,221 @@
+import os
+import json
+import time
+
+from threading import Thread, Lock, Event
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Histogram bucket b holds durations of less than 2 ** b microseconds.
+BUCKETS = 40
+
+
+class Histogram(object):
+    ''' Durations in power of two buckets of microseconds, so recording one
+    is a bit_length and an increment. Percentiles are bucket upper bounds,
+    i.e. exact to a factor of two. '''
+
+    def __init__(self):
+        self.buckets = [0] * BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[min(int(seconds * 1e6).bit_length(), BUCKETS - 1)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, p):
+        rank = p * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bucket) / 1e6, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max
+        }
+
+
+class _NoTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+class _Timer(object):
+    __slots__ = ("stats", "name", "start")
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class Stats(object):
+    ''' Counters, duration histograms and gauges (callables sampled at
+    snapshot time, e.g. queue depths) of the crawl. Everything is a no-op
+    until enable() is called, so instrumented code costs one attribute
+    check when stats are off. '''
+
+    def __init__(self):
+        self.enabled = False
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._counters = dict()
+            self._histograms = dict()
+            self._gauges = dict()
+            self._started = time.time()
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def incr(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def timer(self, name):
+        ''' with stats.timer("parse"): ... records the block's duration. '''
+        if not self.enabled:
+            return _NO_TIMER
+        return _Timer(self, name)
+
+    def gauge(self, name, sample):
+        ''' Report sample() under name in every snapshot. '''
+        with self._lock:
+            self._gauges[name] = sample
+
+    def snapshot(self, previous=None):
+        ''' Everything as a json-able dict. Rates are per second since the
+        `previous` snapshot, or since the start. '''
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                name: histogram.summary()
+                for name, histogram in self._histograms.items()}
+            gauges = list(self._gauges.items())
+        now = time.time()
+        if previous is None:
+            previous = {"time": self._started, "counters": dict()}
+        last_counters = previous["counters"]
+        elapsed = max(now - previous["time"], 1e-9)
+        sampled = dict()
+        for name, sample in gauges:
+            try:
+                sampled[name] = sample()
+            except Exception:
+                sampled[name] = None
+        return {
+            "time": now,
+            "uptime": now - self._started,
+            "counters": counters,
+            "rates": {
+                name: (value - last_counters.get(name, 0)) / elapsed
+                for name, value in counters.items()},
+            "histograms": histograms,
+            "gauges": sampled
+        }
+
+
+# The crawl's statistics, shared by every module.
+stats = Stats()
+
+
+class StatsReporter(object):
+    ''' Writes stats.snapshot() to `path` every `interval` seconds (replaced
+    atomically, so readers never see half a file) and, if `port` is set,
+    serves the current snapshot as json on http://127.0.0.1:port/. '''
+
+    def __init__(self, path, interval=10.0, port=0):
+        self.path = path
+        self.interval = interval
+        self.port = port
+        self._stopped = Event()
+        self._thread = Thread(target=self._run, daemon=True)
+        self._httpd = None
+        self._previous = None
+
+    def start(self):
+        reporter = self
+        if self.port:
+            class Handler(BaseHTTPRequestHandler):
+                def log_message(self, *args):
+                    pass
+
+                def do_GET(self):
+                    # rates since the last snapshot file
+                    snapshot = stats.snapshot(reporter._previous)
+                    body = json.dumps(snapshot, indent=2).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+            self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+            self._httpd.daemon_threads = True
+            Thread(target=self._httpd.serve_forever, daemon=True).start()
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            self.write()
+
+    def write(self):
+        snapshot = stats.snapshot(self._previous)
+        self._previous = snapshot
+        if not self.path:
+            return
+        tmp_file = f"{self.path}.tmp"
+        with open(tmp_file, "w") as snapshot_file:
+            json.dump(snapshot, snapshot_file, indent=2)
+        os.replace(tmp_file, self.path)
+
+    def stop(self):
+        ''' Stop reporting, after one last snapshot. '''
+        self._stopped.set()
+        self._thread.join()
+        self.write()
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
@@ -0,0 +1,84 @@
+import heapq
+
+from operator import itemgetter
+
+
+class TopKCounter(object):
+    ''' Word counts with bounded memory and the top `k` words kept up to date
+    as the counts come in, so reading them never sorts the vocabulary.
+
+    At most 2 * `capacity` words are counted. When that fills up, the words
+    with the lowest counts are dropped until `capacity` are left (lossy
+    counting) and `error` becomes the highest dropped count: every count is
+    at most `error` below the true count, and a word counted more than
+    `error` times is never dropped. With a zipf-like vocabulary the tail
+    that gets dropped is the typos and one-off tokens.
+
+    The top k only changes when a count goes up, and counts only go up, so
+    checking each updated word against the lowest of the k is exact. '''
+
+    def __init__(self, capacity=200000, k=50, counts=None, error=0):
+        self.capacity = capacity
+        self.k = k
+        self.counts = dict(counts) if counts else dict()
+        self.error = error
+        self._top = dict(heapq.nsmallest(
+            k, self.counts.items(), key=lambda x: (-x[1], x[0])))
+        self._worst = None
+        if len(self.counts) > 2 * capacity:
+            self._prune()
+
+    def __len__(self):
+        return len(self.counts)
+
+    def _worst_key(self):
+        # the (-count, word) sort key of the last of the top k
+        if self._worst is None:
+            self._worst = max((-count, tok) for tok, count in self._top.items())
+        return self._worst
+
+    def update(self, frequencies):
+        ''' Add a token -> count mapping, e.g. a Counter. '''
+        counts = self.counts
+        get = counts.get
+        top = self._top
+        # a word below the lowest count of the top k can't be in it
+        floor = -self._worst_key()[0] if len(top) >= self.k else 0
+        for tok, count in frequencies.items():
+            count += get(tok, 0)
+            counts[tok] = count
+            if count < floor:
+                continue
+            if tok in top:
+                top[tok] = count
+                if self._worst is not None and self._worst[1] == tok:
+                    self._worst = None
+            elif len(top) < self.k:
+                top[tok] = count
+                self._worst = None
+            else:
+                worst = self._worst_key()
+                if (-count, tok) < worst:
+                    del top[worst[1]]
+                    top[tok] = count
+                    self._worst = None
+            if len(top) >= self.k:
+                floor = -self._worst_key()[0]
+        if len(counts) > 2 * self.capacity:
+            self._prune()
+
+    def _prune(self):
+        kept = heapq.nlargest(self.capacity + 1, self.counts.items(), key=itemgetter(1))
+        # the highest count that is dropped bounds the error from now on
+        self.error = max(self.error, kept.pop()[1])
+        self.counts = dict(kept)
+        # ties at the cut must not drop a top word
+        self.counts.update(self._top)
+
+    def top(self, n):
+        ''' The n most frequent words as (word, count), most frequent first,
+        ties by word. '''
+        if n > self.k:
+            return heapq.nsmallest(
+                n, self.counts.items(), key=lambda x: (-x[1], x[0]))
+        return sorted(self._top.items(), key=lambda x: (-x[1], x[0]))[:n]
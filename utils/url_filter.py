@@ -0,0 +1,103 @@
+import re
+from urllib.parse import urlparse
+
+# Reasons a url is rejected, returned by check_url.
+NO_HOST = "no_host"
+BAD_SCHEME = "scheme"
+BAD_DOMAIN = "domain"
+TRAP_PATH = "trap_path"
+REPEATED_PATH = "repeated_path"
+# too many query variants of one path, decided by crawler/traps.py
+TRAP_QUERY = "trap_query"
+GITLAB = "gitlab"
+DATASET_FORMAT = "dataset_format"
+EXTENSION = "extension"
+
+MAX_SUBDOMAIN_THRESHOLD = 5
+
+##################################### Rules, compiled once at import
+VALID_SCHEMES = frozenset(["http", "https"])
+# hosts under one of the domains specified by the assignment constraints
+VALID_DOMAIN = re.compile(r'.+\.(?:ics|cs|informatics|stat)\.uci\.edu')
+# common trap patterns (appointments, calendars)
+TRAP_PATH_PATTERN = re.compile(r'/appointment|/calendar')
+# hosts where many urls share a path and only differ in the query
+# (swiki, wiki, elms, gitlab, ...)
+TRAP_HOST_PATTERN = re.compile(r'wiki|elms|gitlab')
+GITLAB_PATH_PATTERN = re.compile(
+    r'/(?:commits|commit|graphs|network|tree|raw|find_file|blame)/'
+    r'|/(?:tags|incidents)(?:/|$)')
+# certain datasets in the ml archive
+DATASETS_PATTERN = re.compile(r'datasets.php')
+EXTENSIONS = frozenset([
+    "css", "js", "bmp", "gif", "jpg", "jpeg", "ico",
+    "png", "tif", "tiff", "mid", "mp2", "mp3", "mp4",
+    "wav", "avi", "mov", "mpeg", "ram", "m4v", "mkv", "ogg", "ogv", "pdf",
+    "ps", "eps", "tex", "ppt", "pptx", "doc", "docx", "xls", "xlsx", "names",
+    "data", "dat", "exe", "bz2", "tar", "msi", "bin", "7z", "psd", "dmg", "iso",
+    "epub", "dll", "cnf", "tgz", "sha1",
+    "thmx", "mso", "arff", "rtf", "jar", "csv",
+    # additional extensions to filter
+    "mpg", "ppsx", "img", "war", "py", "java", "c", "asm", "atom", "apk",
+    "rs", "ds_store", "git",
+    "rm", "smil", "wmv", "swf", "wma", "zip", "rar", "gz"])
+
+
+def has_repeated_segment(path):
+    ''' True if some "/segment/" occurs twice without sharing a slash, e.g.
+    /a/b/a/ but not /a/a/. Same answer as re.match(r'^.*?(/.+?/).*?\\1.*$')
+    in linear time: a repeated multi-segment "/x/y/" implies a repeated
+    "/x/", and a run of slashes only repeats if "///" occurs twice. '''
+    segments = path.split('/')
+    # the last segment is not followed by a slash
+    first_seen = dict()
+    for i in range(1, len(segments) - 1):
+        segment = segments[i]
+        if segment and first_seen.setdefault(segment, i) <= i - 2:
+            return True
+    first = path.find('///')
+    return first != -1 and path.find('///', first + 3) != -1
+
+
+def is_trap_host(hostname):
+    return TRAP_HOST_PATTERN.search(hostname) is not None
+
+
+def check_url(url):
+    ''' Return None if the url should be crawled, otherwise the reason it
+    was rejected. Pure: the answer only depends on the url. '''
+    parsed = urlparse(url)
+    hostname = parsed.hostname
+    if hostname is None:
+        return NO_HOST
+    if parsed.scheme not in VALID_SCHEMES:
+        return BAD_SCHEME
+    if VALID_DOMAIN.match(hostname) is None:
+        return BAD_DOMAIN
+    path = parsed.path.lower()
+    if TRAP_PATH_PATTERN.search(path) is not None:
+        return TRAP_PATH
+    if has_repeated_segment(path):
+        return REPEATED_PATH
+    if 'gitlab' in hostname:
+        if GITLAB_PATH_PATTERN.search(path) is not None:
+            return GITLAB
+    if (DATASETS_PATTERN.search(path) is not None
+            and 'format=' in parsed.query):
+        return DATASET_FORMAT
+    if '.' in path and path.rpartition('.')[2] in EXTENSIONS:
+        return EXTENSION
+    return None
+
+
+def filter_urls(urls, reasons=None):
+    ''' The urls worth crawling, in order. If reasons is a dict, it is
+    updated with the number of rejections per reason. '''
+    valid = list()
+    for url in urls:
+        reason = check_url(url)
+        if reason is None:
+            valid.append(url)
+        elif reasons is not None:
+            reasons[reason] = reasons.get(reason, 0) + 1
+    return valid